@@ -1,5 +1,7 @@
 from moodle.api import MoodleSession
 from muesli.api import MuesliSession
+from util.console import string_table
+from util.metrics import HTTP_METRICS
 
 
 class ConnectionCommand:
@@ -31,7 +33,15 @@ class ConnectionCommand:
 
     @property
     def help(self):
-        return "No help available."
+        return "Shows and changes the state of the connections to MÜSLI and Moodle.\n" \
+               "Aliases:\n" \
+               "  ■ conn\n" \
+               "Optional Flags (one of):\n" \
+               "  ■ --state  , -s: show whether both sessions are online (default)\n" \
+               "  ■ --login  , -i: log into both services\n" \
+               "  ■ --logout , -o: log out of both services\n" \
+               "  ■ --metrics, -m: show the HTTP requests per endpoint and per command\n" \
+               "  ■ --metrics=<path>: write all recorded HTTP requests with their rollups as JSON\n"
 
     def __call__(self, *args):
         if len(args) == 0:
@@ -45,6 +55,12 @@ class ConnectionCommand:
                 self._print_states()
             elif argument in ("--logout", "-o"):
                 self._logout_all()
+            elif argument in ("--metrics", "-m"):
+                self._print_metrics()
+            elif argument.startswith("--metrics="):
+                path = argument.split("=", 1)[1]
+                count = HTTP_METRICS.export_json(path)
+                self.printer.confirm(f"Exported {count} requests to '{path}'.")
             else:
                 raise ValueError(f"Unknown argument '{argument}'")
 
@@ -79,3 +95,33 @@ class ConnectionCommand:
             self.printer.warning(state)
         else:
             self.printer.error(state)
+
+    def _print_metrics(self):
+        endpoints = HTTP_METRICS.by_endpoint()
+        if len(endpoints) == 0:
+            self.printer.warning("No HTTP requests recorded yet.")
+            return
+
+        self._print_rollup(["Service", "Method", "Endpoint"], endpoints)
+        self.printer.inform()
+        self._print_rollup(["Command"], HTTP_METRICS.by_context())
+
+        caches = HTTP_METRICS.cache_statistics()
+        if len(caches) > 0:
+            self.printer.inform()
+            for name, counts in caches.items():
+                self.printer.inform(f"Cache {name}: {counts['hits']} hits, {counts['misses']} misses")
+
+    def _print_rollup(self, key_header, rollup):
+        header = key_header + ["Requests", "Errors", "KiB", "Total [ms]", "p50 [ms]", "Max [ms]"]
+        columns = [[entry.key[i] for entry in rollup] for i in range(len(key_header))]
+        columns += [
+            [entry.requests for entry in rollup],
+            [entry.errors for entry in rollup],
+            [f"{entry.bytes / 1024:.1f}" for entry in rollup],
+            [f"{entry.total_latency * 1000:.0f}" for entry in rollup],
+            [f"{entry.p50_latency * 1000:.0f}" for entry in rollup],
+            [f"{entry.max_latency * 1000:.0f}" for entry in rollup]
+        ]
+        for line in string_table(header, columns):
+            self.printer.inform(line)
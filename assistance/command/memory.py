@@ -0,0 +1,150 @@
+from util.console import string_table
+from util.memory import live_objects
+
+
+class MemoryCommand:
+    def __init__(self, printer, profiler, settings):
+        self.printer = printer
+        self._profiler = profiler
+        self._settings = settings
+
+        self._name = "memory"
+        self._aliases = ("mem",)
+        self._min_arg_count = 0
+        self._max_arg_count = 1
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def aliases(self):
+        return self._aliases
+
+    @property
+    def min_arg_count(self):
+        return self._min_arg_count
+
+    @property
+    def max_arg_count(self):
+        return self._max_arg_count
+
+    @property
+    def help(self):
+        return "Shows where the assistant allocates memory, based on tracemalloc snapshots.\n" \
+               "Without arguments the traced memory, its peak and the top allocation sites are shown.\n" \
+               "Aliases:\n" \
+               "  ■ mem\n" \
+               "Optional Flags (one of):\n" \
+               "  ■ --start[=<frames>]: start tracing allocations; only memory allocated afterwards is seen\n" \
+               "  ■ --stop: stop tracing and the sampler, which frees the memory of the tracing\n" \
+               "  ■ --top[=<n>], -t: the n allocation sites holding the most memory (default: 10)\n" \
+               "  ■ --growth, -g: allocation sites that grew or shrank since the last snapshot\n" \
+               "  ■ --objects[=<type>], -o: live objects by type with their shallow size; byte buffers are\n" \
+               "                            counted separately, the type filter is a substring like 'Student'\n" \
+               "  ■ --sample=<seconds>: dump a snapshot periodically into the memory folder in __meta__\n" \
+               "  ■ --sample=off: stop the periodic sampler\n" \
+               "  ■ --dump=<path>: write the current snapshot to a file, which can be loaded with\n" \
+               "                   tracemalloc.Snapshot.load\n" \
+               "Sampling can also be started with the 'memory' section of config.json.\n" \
+               "Example usage:\n" \
+               "  memory --start\n" \
+               "  memory --growth\n"
+
+    def __call__(self, *args):
+        if len(args) == 0:
+            self._print_status()
+            return
+
+        argument = args[0]
+        name, _, value = argument.partition("=")
+        if name == "--start":
+            self._profiler.start(int(value) if value else self._settings.frames)
+            self.printer.confirm("Started tracing memory allocations.")
+        elif argument == "--stop":
+            self._profiler.stop()
+            self.printer.confirm("Stopped tracing memory allocations.")
+        elif name in ("--top", "-t"):
+            self._print_sites(self._profiler.top(int(value) if value else 10), with_growth=False)
+        elif argument in ("--growth", "-g"):
+            self._print_growth()
+        elif name in ("--objects", "-o"):
+            self._print_objects(value or None)
+        elif name == "--sample" and value == "off":
+            self._profiler.stop_sampler()
+            self.printer.confirm("Stopped the memory sampler.")
+        elif name == "--sample" and value:
+            self._profiler.start(self._settings.frames)
+            self._profiler.start_sampler(float(value), self._settings.sample_folder, self._settings.max_samples)
+            self.printer.confirm(f"Writing a snapshot every {float(value):g}s to '{self._settings.sample_folder}'.")
+        elif name == "--dump" and value:
+            count = self._profiler.dump(value)
+            self.printer.confirm(f"Wrote a snapshot with {count} traces to '{value}'.")
+        else:
+            raise ValueError(f"Unknown argument '{argument}'")
+
+    def _print_status(self):
+        if not self._profiler.tracing:
+            self.printer.warning("Memory tracing is not running, start it with 'memory --start'.")
+            self._print_objects(None, limit=5)
+            return
+
+        current, peak = self._profiler.traced_memory()
+        self.printer.inform(f"Traced memory: {_format_size(current)} (peak {_format_size(peak)})")
+        if self._profiler.sampling:
+            samples = self._profiler.samples
+            self.printer.inform(f"Sampler is running, {len(samples)} snapshots in '{self._settings.sample_folder}'.")
+        self._print_sites(self._profiler.top(10), with_growth=False)
+
+    def _print_growth(self):
+        sites = self._profiler.growth(10)
+        if sites is None:
+            self.printer.inform("Took the first snapshot, run 'memory --growth' again to see the growth.")
+        elif len(sites) == 0:
+            self.printer.inform("Nothing changed since the last snapshot.")
+        else:
+            self._print_sites(sites, with_growth=True)
+
+    def _print_sites(self, sites, with_growth):
+        header = ["Allocation site", "Size", "Blocks"]
+        columns = [
+            [_shorten(site.site) for site in sites],
+            [_format_size(site.size) for site in sites],
+            [site.count for site in sites]
+        ]
+        if with_growth:
+            header += ["Growth", "Blocks"]
+            columns += [
+                [('+' if site.size_diff > 0 else '-') + _format_size(abs(site.size_diff)) for site in sites],
+                [f"{site.count_diff:+d}" for site in sites]
+            ]
+
+        for line in string_table(header, columns):
+            self.printer.inform(line)
+
+    def _print_objects(self, type_filter, limit=15):
+        entries = live_objects(limit, type_filter)
+        if len(entries) == 0:
+            self.printer.warning(f"No live objects of type '{type_filter}'.")
+            return
+
+        header = ["Type", "Count", "Size"]
+        columns = [
+            [entry.type for entry in entries],
+            [entry.count for entry in entries],
+            [_format_size(entry.size) for entry in entries]
+        ]
+        for line in string_table(header, columns):
+            self.printer.inform(line)
+
+
+def _format_size(size):
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _shorten(site, length=70):
+    return site if len(site) <= length else '...' + site[-(length - 3):]
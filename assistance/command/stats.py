@@ -0,0 +1,76 @@
+from util.console import string_table
+
+
+class StatsCommand:
+    def __init__(self, printer, tracer):
+        self.printer = printer
+        self._tracer = tracer
+
+        self._name = "statistics"
+        self._aliases = ("stats",)
+        self._min_arg_count = 0
+        self._max_arg_count = 1
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def aliases(self):
+        return self._aliases
+
+    @property
+    def min_arg_count(self):
+        return self._min_arg_count
+
+    @property
+    def max_arg_count(self):
+        return self._max_arg_count
+
+    @property
+    def help(self):
+        return "Shows how often and how long startup phases, commands and HTTP requests took.\n" \
+               "Aliases:\n" \
+               "  ■ stats\n" \
+               "Optional Named Arguments:\n" \
+               "  ■ --export, -e: path of a trace file in the Chrome trace event format, which can be opened\n" \
+               "                  with chrome://tracing or https://ui.perfetto.dev [type: str]\n" \
+               "Optional Flags:\n" \
+               "  ■ --reset, -r: discard all recorded spans\n" \
+               "  ■ --on / --off: enable or disable the recording\n"
+
+    def __call__(self, *args):
+        if len(args) == 0:
+            self._print_summary()
+            return
+
+        argument = args[0]
+        if argument.startswith("--export=") or argument.startswith("-e="):
+            path = argument.split("=", 1)[1]
+            count = self._tracer.export_chrome_trace(path)
+            self.printer.confirm(f"Exported {count} spans to '{path}'.")
+        elif argument in ("--reset", "-r"):
+            self._tracer.reset()
+            self.printer.confirm("Discarded all recorded spans.")
+        elif argument in ("--on", "--off"):
+            self._tracer.enabled = argument == "--on"
+            self.printer.confirm(f"Recording is {'enabled' if self._tracer.enabled else 'disabled'}.")
+        else:
+            raise ValueError(f"Unknown argument '{argument}'")
+
+    def _print_summary(self):
+        summary = self._tracer.summary()
+        if len(summary) == 0:
+            self.printer.warning("No spans recorded yet." if self._tracer.enabled else "Recording is disabled.")
+            return
+
+        header = ["Span", "Count", "Total [ms]", "p50 [ms]", "p95 [ms]"]
+        columns = [
+            [entry.name for entry in summary],
+            [entry.count for entry in summary],
+            [f"{entry.total * 1000:.1f}" for entry in summary],
+            [f"{entry.p50 * 1000:.1f}" for entry in summary],
+            [f"{entry.p95 * 1000:.1f}" for entry in summary]
+        ]
+        for line in string_table(header, columns):
+            self.printer.inform(line)
@@ -6,7 +6,7 @@ class StopCommand:
         self._name = "stop"
         self._aliases = ("exit", "finish", "cancel", "terminate")
         self._min_arg_count = 0
-        self._max_arg_count = 0
+        self._max_arg_count = 1
 
     @property
     def name(self):
@@ -26,7 +26,16 @@ class StopCommand:
 
     @property
     def help(self):
-        return "No help available."
+        return "Closes the connections to MÜSLI and Moodle and terminates the assistant.\n" \
+               "Aliases:\n" \
+               "  ■ exit, finish, cancel, terminate\n" \
+               "Optional Flags:\n" \
+               "  ■ --keep-session, -k: skip the logout and reuse both sessions on the next start\n"
 
-    def __call__(self):
-        self._function()
\ No newline at end of file
+    def __call__(self, *args):
+        if len(args) == 0:
+            self._function()
+        elif args[0] in ("--keep-session", "-k"):
+            self._function(keep_session=True)
+        else:
+            raise ValueError(f"Unknown argument '{args[0]}'")
@@ -1,18 +1,32 @@
 import os
 import re
 import shutil
+import time
 from collections import defaultdict
-from json import dump as json_save
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from json import load as j_load
 from os.path import join as p_join
 from types import SimpleNamespace
-from zipfile import BadZipFile
 
 from assistance.command.info import select_student_by_name
 from data.data import Student
-from mail.mail_out import EMailSender
-from util.console import single_choice
-from util.feedback import FeedbackPolisher
+from data.group_registry import normalize_variant
+from data.manifest import STAGES, hash_file, hash_files, fingerprint_tree
+from data.storage import ensure_folder_exists
+from mail.delivery import DeliveryEngine, delivery_settings
+from mail.mail_out import build_feedback_mail, write_feedback_mail
+from util.archive import ARCHIVE_EXTENSIONS, split_archive_name, extract_all, extraction_limits, \
+    extract_in_subprocess
+from util.console import single_choice, string_table
+from util.feedback import consolidate_all
+from util.pipeline import Pipeline, PipelineStage
+from util.staging import TreeStager
+
+DEFAULT_WORKFLOW_CONFIG = {
+    "download_workers": 4,
+    "extraction_workers": None
+}
 
 
 class WorkflowDownloadCommand:
@@ -59,9 +73,6 @@ class WorkflowUnzipCommand:
         self.printer = printer
         self._storage = storage
 
-        from py7zr import unpack_7zarchive
-        shutil.register_unpack_format('7zip', ['.7z'], unpack_7zarchive)
-
         self._name = "workflow.unzip"
         self._aliases = ("w.uz",)
         self._min_arg_count = 1
@@ -90,73 +101,139 @@ class WorkflowUnzipCommand:
     def __call__(self, *args):
         try:
             exercise_number = int(args[0])
-            raw_folder = self._storage.get_raw_folder(exercise_number)
-            preprocessed_folder = self._storage.get_preprocessed_folder(exercise_number)
-
-            for file in os.listdir(raw_folder):
-                if file.endswith((".zip", ".tar.gz", ".tar", ".7z")):
-                    if file.endswith(".tar.gz"):
-                        extension = ".tar.gz"
-                        file_name = file[:len(extension)]
-                    else:
-                        file_name, extension = os.path.splitext(file)
-
-                    try:
-                        source_path = os.path.join(raw_folder, file)
-                        normalized_name, problems = self._normalize_file_name(file_name, exercise_number)
-                        target_path = os.path.join(preprocessed_folder, normalized_name)
-
-                        if not extension.endswith("zip"):
-                            problems.append(f"Minor: Wrong archive format, please use '.zip' instead of '{extension}'.")
-
-                        self.printer.inform(f"Unpacking {file} ... ", end="")
-                        if len(problems) > 0:
-                            self.printer.inform()
-                            self.printer.warning("While normalizing name there were some problems:")
-                            self.printer.indent()
-                            for problem in problems:
-                                self.printer.warning("- " + problem)
-                            self.printer.outdent()
-
-                        try:
-                            shutil.unpack_archive(source_path, target_path)
-                        except BadZipFile as e:
-                            self.printer.warning("")
-                            self.printer.warning(f"Detected bad zip file: {e}")
-                            self.printer.warning(f"Trying different archive types ...")
-                            with self.printer:
-                                problem = None
-                                for type in ("7z", "tar", "gztar", "bztar", "xztar"):
-                                    try:
-                                        shutil.unpack_archive(source_path, target_path, format=type)
-                                        problem = f"Wrong file extension provided - this file was actually a {type}!"
-                                        break
-                                    except:
-                                        self.printer.warning(f"... {type} failed!")
-
-                            if problem is None:
-                                self.printer.error(f"Fatal error: {file} could not be unpacked!")
-                                self.printer.error("[ERR]")
-                                continue
-                            else:
-                                problems.append(problem)
-
-                        self.printer.confirm("[OK]")
-
-                        with open(os.path.join(target_path, "submission_meta.json"), 'w', encoding='utf-8') as fp:
-                            data = {
-                                "original_name": file,
-                                "problems": problems
-                            }
-                            json_save(data, fp)
-
-                    except shutil.ReadError:
-                        self.printer.error(f"Not supported archive-format: '{extension}'")
-
-                    self.printer.inform("─" * 100)
-
         except ValueError:
             self.printer.error(f"Exercise number must be an integer, not '{args[0]}'")
+            return
+
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        plans = self._plan_extraction(exercise_number, manifest)
+        if len(plans) == 0:
+            self.printer.confirm("All archives are already unpacked.")
+            return
+
+        self.printer.inform(f"Unpacking {len(plans)} archives ... ", end='')
+        results = extract_all(plans, workflow_settings(self._storage.workflow_config).extraction_workers)
+        self.printer.confirm("[OK]")
+        self.printer.inform()
+        self._print_report(results)
+
+        plans_by_file = {plan.file: plan for plan in plans}
+        for result in results:
+            self.record_result(manifest, plans_by_file[result.file], result)
+        manifest.save()
+
+    def _plan_extraction(self, exercise_number, manifest):
+        raw_folder = self._storage.get_raw_folder(exercise_number)
+        limits = extraction_limits(self._storage.extraction_config)
+        plans = list()
+        claimed = dict()
+        unchanged = 0
+
+        for file in sorted(os.listdir(raw_folder)):
+            if file.endswith(ARCHIVE_EXTENSIONS):
+                plan = self.plan_file(os.path.join(raw_folder, file), exercise_number, manifest, limits, claimed)
+                if plan is None:
+                    unchanged += 1
+                else:
+                    plans.append(plan)
+
+        self._storage.save_group_registry()
+        if unchanged > 0:
+            self.printer.inform(f"Skipped {unchanged} unchanged archives.")
+
+        return plans
+
+    def plan_file(self, source_path, exercise_number, manifest, limits, claimed):
+        preprocessed_folder = self._storage.get_preprocessed_folder(exercise_number)
+        file = os.path.basename(source_path)
+        content_hash = hash_file(source_path)
+        record = manifest.get("unzip", file)
+        if manifest.is_done("unzip", file, content_hash) \
+                and os.path.isdir(os.path.join(preprocessed_folder, record["directory"])):
+            return None
+
+        if record is not None and record["done"]:
+            previous_target = os.path.join(preprocessed_folder, record["directory"])
+            self.printer.warning(f"{file} changed since the last run - replacing '{record['directory']}'.")
+            shutil.rmtree(previous_target, ignore_errors=True)
+
+        file_name, extension = split_archive_name(file)
+        file_name = re.sub(r' \(\d+\)$', '', file_name)
+        normalized_name, problems = self._normalize_file_name(file_name, exercise_number)
+
+        if not extension.endswith("zip"):
+            problems.append(f"Minor: Wrong archive format, please use '.zip' instead of '{extension}'.")
+
+        target_name = self._unique_directory(normalized_name, file, manifest, claimed)
+        if target_name != normalized_name:
+            self.printer.warning(f"{file} -> '{normalized_name}' is already used by {claimed[normalized_name]}, "
+                                 f"unpacking into '{target_name}' instead.")
+        claimed[target_name] = file
+
+        self.printer.inform("─" * 100)
+        return SimpleNamespace(
+            file=file,
+            extension=extension,
+            content_hash=content_hash,
+            source_path=source_path,
+            target_path=os.path.join(preprocessed_folder, target_name),
+            problems=problems,
+            limits=limits
+        )
+
+    @staticmethod
+    def _unique_directory(name, file, manifest, claimed):
+        for other_file, record in manifest.records("unzip").items():
+            if other_file != file and "directory" in record:
+                claimed.setdefault(record["directory"], other_file)
+
+        unique_name, number = name, 1
+        while claimed.get(unique_name, file) != file:
+            number += 1
+            unique_name = f"{name}_{number}"
+        return unique_name
+
+    @staticmethod
+    def record_result(manifest, plan, result):
+        directory = os.path.basename(result.target_path)
+        if result.success:
+            manifest.mark_done("unzip", result.file, plan.content_hash, directory=directory)
+        else:
+            manifest.mark_failed("unzip", result.file, plan.content_hash, " ".join(result.log), directory=directory)
+
+    def print_result(self, result):
+        self.printer.inform(f"{result.file} -> {os.path.basename(result.target_path)} ", end='')
+        if result.success:
+            self.printer.confirm("[OK]")
+        else:
+            self.printer.error("[ERR]")
+
+        with self.printer:
+            for line in result.log:
+                self.printer.warning(line)
+            if result.skipped is not None and result.skipped["count"] > 0:
+                self.printer.inform(f"Skipped {result.skipped['count']} entries "
+                                    f"({result.skipped['bytes'] / 2 ** 20:.1f} MB):")
+                with self.printer:
+                    for entry in result.skipped["entries"]:
+                        self.printer.inform(f"- {entry['name']} ({entry['reason']})")
+            if len(result.problems) > 0:
+                self.printer.warning("While normalizing name there were some problems:")
+                with self.printer:
+                    for problem in result.problems:
+                        self.printer.warning("- " + problem)
+
+    def _print_report(self, results):
+        for result in results:
+            self.print_result(result)
+
+        failed = len([result for result in results if not result.success])
+        self.printer.inform("─" * 100)
+        self.printer.inform(f"Unpacked {len(results) - failed} of {len(results)} archives.", end='')
+        if failed > 0:
+            self.printer.error(f" {failed} failed!")
+        else:
+            self.printer.inform()
 
     def _normalize_file_name(self, file_name, exercise_number):
         problems = list()
@@ -173,25 +250,85 @@ class WorkflowUnzipCommand:
         self.printer.inform(f"Finding students of '{file_name}'.")
         hyphen_score = file_name.count('-')
         underscore_score = file_name.count('_')
+        looks_correct = hyphen_score - 1 == underscore_score
         student_names = list()
 
-        if hyphen_score - 1 == underscore_score:
-            result = self._possible_correct_naming(
+        students = self._known_group(file_name, looks_correct)
+        if students is not None:
+            self.printer.confirm(f"Recognized group: {', '.join(str(student) for student in students)}")
+            result = self._group_file_name([student.muesli_name for student in students], correct_file_name_end)
+            problems.extend(self._group_size_problems(students))
+            if not looks_correct:
+                problems.append(
+                    f"Please use the correct file format! For this submission it would have been '{result}.zip'"
+                )
+        elif looks_correct:
+            result, students = self._possible_correct_naming(
                 file_name,
                 student_names,
                 problems,
                 correct_file_name_end
             )
         else:
-            result = self._definitely_not_correct_naming(
+            result, students = self._definitely_not_correct_naming(
                 file_name,
                 student_names,
                 problems,
                 correct_file_name_end
             )
 
+        muesli_ids = [student.muesli_student_id for student in students if type(student) is Student]
+        for change in self._storage.group_registry.record(file_name, muesli_ids, exercise_number):
+            self.printer.warning(change)
+
         return result, problems
 
+    def _known_group(self, file_name, looks_correct):
+        group, exact = self._storage.group_registry.resolve(file_name)
+        if group is None:
+            return None
+
+        try:
+            students = [self._storage.get_student_by_muesli_id(muesli_id) for muesli_id in group["muesli_ids"]]
+        except ValueError:
+            return None
+
+        if not exact:
+            normalized_name = normalize_variant(file_name)
+            last_names = [normalize_variant(student.muesli_name.split()[-1]) for student in students]
+            if not all(last_name in normalized_name for last_name in last_names):
+                return None
+            if len(file_name.split('_')) != len(students) and (looks_correct or '_' in file_name):
+                return None
+
+            # everything in the name has to belong to the members, otherwise someone may be missing
+            remainder = normalized_name
+            name_parts = {normalize_variant(part) for student in students for part in student.muesli_name.split()}
+            for part in sorted(name_parts, key=len, reverse=True):
+                remainder = remainder.replace(part, '')
+            if not re.fullmatch(r'(ex)?\d*', remainder):
+                return None
+
+        return students
+
+    @staticmethod
+    def _group_file_name(names, correct_file_name_end):
+        student_names = list()
+        for student_name in sorted(names):
+            name_parts = [_ for _ in student_name.split() if len(_) > 0 and '.' not in _]
+            student_names.append(f'{name_parts[0].replace("-", "")}-{name_parts[-1].replace("-", "")}')
+
+        return '_'.join(student_names) + correct_file_name_end
+
+    @staticmethod
+    def _group_size_problems(students):
+        problems = list()
+        if len(students) < 2:
+            problems.append("Submission groups should consist at least of 2 members!")
+        if 3 < len(students):
+            problems.append("Submission groups should consist at most of 3 members!")
+        return problems
+
     def _suffix_check(self, exercise_number, file_name, problems, correct_file_name_end):
         self.printer.inform("Checking file name suffix.")
         if file_name.endswith(f"-ex{exercise_number:02d}") or file_name.endswith(f"-ex{exercise_number:}"):
@@ -245,7 +382,6 @@ class WorkflowUnzipCommand:
                         students.append(student)
                     else:
                         self.printer.error("Manual correction failed!")
-        student_names = []
 
         def to_name(s):
             if type(s) == str:
@@ -253,22 +389,14 @@ class WorkflowUnzipCommand:
             else:
                 return s.muesli_name
 
-        for student_name in sorted([to_name(student) for student in students]):
-            name_parts = [_ for _ in student_name.split() if len(_) > 0 and '.' not in _]
-            student_names.append(f'{name_parts[0].replace("-", "")}-{name_parts[-1].replace("-", "")}')
-
-        if len(student_names) < 2:
-            problems.append("Submission groups should consist at least of 2 members!")
-        if 3 < len(student_names):
-            problems.append("Submission groups should consist at most of 3 members!")
-
-        result = '_'.join(student_names) + correct_file_name_end
+        problems.extend(self._group_size_problems(students))
+        result = self._group_file_name([to_name(student) for student in students], correct_file_name_end)
         if needed_manual_help:
             problems.append(
                 f"Please use the correct file format! For this submission it would have been '{result}.zip'"
             )
 
-        return result
+        return result, students
 
     def _manual_student_selection(self):
         self.printer.inform("No match found in extended scope - manual correction needed.")
@@ -291,42 +419,37 @@ class WorkflowUnzipCommand:
         self.printer.inform()
         self.printer.inform("Please enter the names you can read in the file name separated with ','.")
 
+        students = list()
         names = self.printer.input(">: ")
         for name in names.split(','):
-            student = self._select_student(name=name)
+            student = self._select_student(name=name, return_name=False)
             if student is not None:
-                student_names.append(student)
+                students.append(student)
             else:
                 while student is None:
                     self.printer.warning(f"Did not find a student with name '{name}'.")
                     self.printer.inform("Please try again or type 'cancel' to skip this name.")
-                    student = self._select_student()
+                    student = self._select_student(return_name=False)
                     if student == 'cancel':
                         break
 
                 if student != 'cancel':
-                    student_names.append(student)
+                    students.append(student)
 
-        result = []
-        for student_name in sorted(student_names):
-            name_parts = [_ for _ in student_name.split() if len(_) > 0]
-            result.append(f'{name_parts[0].replace("-", "")}-{name_parts[-1].replace("-", "")}')
-
-        if len(result) < 2:
-            problems.append("Submission groups should consist at least of 2 members!")
-        if 3 < len(result):
-            problems.append("Submission groups should consist at most of 3 members!")
+        students = [student for student in students if type(student) is Student]
+        student_names.extend(student.muesli_name for student in students)
 
-        result = '_'.join(result) + correct_file_name_end
+        problems.extend(self._group_size_problems(students))
+        result = self._group_file_name(student_names, correct_file_name_end)
         problems.append(f"Please use the correct file format! For this submission it would have been '{result}.zip'")
 
-        return result
+        return result, students
 
     def _select_student(self, return_name=True, mode='my', name=None):
         if name is None:
             name = self.printer.input(">: ")
 
-        if name is 'cancel':
+        if name == 'cancel':
             result = 'cancel'
         elif len(name) == 0:
             result = 'cancel'
@@ -361,7 +484,7 @@ class WorkflowPrepareCommand:
         self._name = "workflow.prepare"
         self._aliases = ("w.prep",)
         self._min_arg_count = 1
-        self._max_arg_count = 1
+        self._max_arg_count = 2
 
     @property
     def name(self):
@@ -381,41 +504,101 @@ class WorkflowPrepareCommand:
 
     @property
     def help(self):
-        return "No help available."
+        return "Copies the unpacked submissions into the working folder and generates feedback templates.\n" \
+               "Aliases:\n" \
+               "  ■ w.prep\n" \
+               "Required Arguments:\n" \
+               "  ■ number of the exercise [type: int]\n" \
+               "Optional Flags:\n" \
+               "  ■ --force, -f: regenerate feedback templates whose inputs changed. Templates you already\n" \
+               "                 edited are kept.\n" \
+               "Files are staged as copy-on-write reflinks where the file system supports them and copied\n" \
+               "otherwise (config: storage.staging).\n" \
+               "Example usage:\n" \
+               "  workflow.prepare 3\n" \
+               "  workflow.prepare 3 --force\n"
 
     def __call__(self, *args):
         try:
             exercise_number = int(args[0])
-
-            preprocessed_folder = self._storage.get_preprocessed_folder(exercise_number)
-            working_folder = self._storage.get_working_folder(exercise_number)
-
-            if not os.path.exists(preprocessed_folder):
-                self.printer.error(f"The data for exercise {exercise_number} was not preprocessed. "
-                                   f"Run workflow.unzip first.")
-
-            can_generate_feedback = False
-            if not self._storage.has_exercise_meta(exercise_number):
-                self.printer.inform("Meta data for exercise not found. Syncing from MÜSLI ... ", end='')
-                try:
-                    self._storage.update_exercise_meta(self._muesli, exercise_number)
-                    can_generate_feedback = True
-                    self.printer.confirm("[OK]")
-                except TypeError:
-                    self.printer.error("[Err]")
-                    self.printer.error("No credit stats found for this exercise.")
-            else:
-                can_generate_feedback = True
-
-            for directory in os.listdir(preprocessed_folder):
-                src_directory = os.path.join(preprocessed_folder, directory)
-                target_directory = os.path.join(working_folder, directory)
-                if not os.path.exists(target_directory):
-                    shutil.copytree(src_directory, target_directory)
-                if can_generate_feedback and os.path.isdir(target_directory):
-                    self._storage.generate_feedback_template(exercise_number, target_directory, self.printer)
         except ValueError:
             self.printer.error(f"Exercise number must be an integer, not '{args[0]}'")
+            return
+
+        force = False
+        if len(args) == 2:
+            if args[1] not in ("--force", "-f"):
+                raise ValueError(f"Unknown argument '{args[1]}'")
+            force = True
+
+        preprocessed_folder = self._storage.get_preprocessed_folder(exercise_number)
+        working_folder = self._storage.get_working_folder(exercise_number)
+
+        if not os.path.exists(preprocessed_folder):
+            self.printer.error(f"The data for exercise {exercise_number} was not preprocessed. "
+                               f"Run workflow.unzip first.")
+            return
+
+        template = self.compile_template(exercise_number)
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        stager = TreeStager(self._storage.staging_mode)
+        outcomes = defaultdict(int)
+        for directory in sorted(os.listdir(preprocessed_folder)):
+            if os.path.isdir(os.path.join(preprocessed_folder, directory)):
+                outcomes[self.prepare_directory(directory, exercise_number, template, manifest, stager, force)] += 1
+
+        manifest.save()
+        if stager.number_of_files > 0:
+            self.printer.inform(f"Staged {stager.summary}.")
+        if outcomes["rendered"] > 0:
+            self.printer.inform(f"Generated {outcomes['rendered']} feedback templates.")
+        if outcomes["unchanged"] > 0:
+            self.printer.inform(f"Skipped {outcomes['unchanged']} unchanged submissions.")
+
+    def compile_template(self, exercise_number):
+        if not self._storage.has_exercise_meta(exercise_number):
+            self.printer.inform("Meta data for exercise not found. Syncing from MÜSLI ... ", end='')
+            try:
+                self._storage.update_exercise_meta(self._muesli, exercise_number)
+                self.printer.confirm("[OK]")
+            except TypeError:
+                self.printer.error("[Err]")
+                self.printer.error("No credit stats found for this exercise.")
+                return None
+
+        return self._storage.compile_feedback_template(exercise_number)
+
+    def prepare_directory(self, directory, exercise_number, template, manifest, stager, force=False):
+        src_directory = os.path.join(self._storage.get_preprocessed_folder(exercise_number), directory)
+        target_directory = os.path.join(self._storage.get_working_folder(exercise_number), directory)
+
+        fingerprint = fingerprint_tree(src_directory)
+        record = manifest.get("prepare", directory)
+        if os.path.exists(target_directory):
+            if manifest.is_done("prepare", directory, fingerprint):
+                if force and template is not None \
+                        and self._render(template, manifest, directory, target_directory, fingerprint, record):
+                    return "rendered"
+                return "unchanged"
+            if record is not None:
+                self.printer.warning(f"'{directory}' changed after it was staged. The working copy is kept - "
+                                     f"remove it manually to stage the new version.")
+                return "kept"
+        else:
+            stager.stage(src_directory, target_directory)
+
+        if template is not None and self._render(template, manifest, directory, target_directory, fingerprint):
+            return "rendered"
+        return "staged"
+
+    def _render(self, template, manifest, directory, target_directory, fingerprint, record=None):
+        details = self._storage.generate_feedback_template(template, target_directory, self.printer, record)
+        if details is not None:
+            manifest.mark_done("prepare", directory, fingerprint, **details)
+        elif record is None:
+            manifest.mark_done("prepare", directory, fingerprint)
+
+        return details is not None
 
 
 class WorkflowConsolidate:
@@ -452,20 +635,81 @@ class WorkflowConsolidate:
         exercise_number = int(args[0])
         working_folder = self._storage.get_working_folder(exercise_number)
         finished_folder = self._storage.get_finished_folder(exercise_number)
+        feedback_file_name = f"{self._storage.muesli_data.feedback.file_name}.txt"
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        unchanged = 0
+        jobs = list()
 
         for directory in os.listdir(working_folder):
+            feedback_path = p_join(working_folder, directory, feedback_file_name)
+            if not os.path.exists(feedback_path):
+                continue
+
+            content_hash = hash_file(feedback_path)
+            if manifest.is_done("consolidate", directory, content_hash) \
+                    and os.path.exists(p_join(finished_folder, directory)):
+                unchanged += 1
+                continue
+
+            jobs.append(SimpleNamespace(
+                directory=directory,
+                content_hash=content_hash,
+                working_directory=p_join(working_folder, directory),
+                finished_directory=p_join(finished_folder, directory)
+            ))
+
+        if unchanged > 0:
+            self.printer.inform(f"Skipped {unchanged} unchanged feedback files.")
+        if len(jobs) == 0:
+            self.printer.confirm("All feedback files are already consolidated.")
+            return
+
+        self.printer.inform(f"Polishing {len(jobs)} feedback files ... ", end='')
+        results = consolidate_all(self._storage.roster_snapshot(), jobs)
+        self.printer.confirm("[Ok]")
+
+        for result in results:
+            if result.success:
+                manifest.mark_done("consolidate", result.directory, result.content_hash)
+            else:
+                manifest.mark_failed("consolidate", result.directory, result.content_hash, result.error)
+        manifest.save()
+
+        self._print_summary(results)
+
+    def _print_summary(self, results):
+        failed = [result for result in results if not result.success]
+        succeeded = [result for result in results if result.success]
+
+        for result in results:
+            if len(result.messages) > 0 or not result.success:
+                self.printer.inform(f"{result.directory}:")
+                with self.printer:
+                    for level, message in result.messages:
+                        getattr(self.printer, level)(message)
+                    if not result.success:
+                        self.printer.error(f"[Err] {result.error}")
+
+        if len(succeeded) > 0:
+            number_of_tasks = max(len(result.credits_per_task) for result in succeeded)
+            header = ["Group"] + [f"{self._storage.muesli_data.feedback.task_prefix[0]} {i + 1}"
+                                  for i in range(number_of_tasks)] + ["∑"]
+            columns = [[", ".join(result.names) for result in succeeded]]
+            for i in range(number_of_tasks):
+                columns.append([result.credits_per_task[i] if i < len(result.credits_per_task) else "-"
+                                for result in succeeded])
+            columns.append([sum(result.credits_per_task) for result in succeeded])
+
+            self.printer.inform()
+            for line in string_table(header, columns):
+                self.printer.inform(line)
+
+        self.printer.inform()
+        self.printer.inform(f"Consolidated {len(succeeded)} of {len(results)} feedback files.", end='')
+        if len(failed) > 0:
+            self.printer.error(f" {len(failed)} failed!")
+        else:
             self.printer.inform()
-            self.printer.inform(f"Working in {directory}")
-            self.printer.inform("Polishing feedback ... ", end='')
-            polisher = FeedbackPolisher(
-                self._storage,
-                p_join(working_folder, directory),
-                self.printer
-            )
-            self.printer.confirm("[Ok]")
-            self.printer.inform("Saving meta data   ... ", end='')
-            polisher.save_meta_to_folder(p_join(finished_folder, directory))
-            self.printer.confirm("[Ok]")
 
 
 class WorkflowUpload:
@@ -503,15 +747,34 @@ class WorkflowUpload:
         exercise_number = int(args[0])
         finished_folder = self._storage.get_finished_folder(exercise_number)
         meta_file_name = "meta.json"
+        manifest = self._storage.get_stage_manifest(exercise_number)
 
         data = defaultdict(dict)
-
-        for directory in os.listdir(finished_folder):
-            with open(p_join(finished_folder, directory, meta_file_name), 'r', encoding="utf-8") as fp:
-                meta = SimpleNamespace(**j_load(fp))
-                for muesli_id in meta.muesli_ids:
-                    student = self._storage.get_student_by_muesli_id(muesli_id)
+        directories = defaultdict(dict)
+        unchanged = 0
+        students = self._storage.student_index()
+        missing_ids = dict()
+
+        metas = read_meta_files(finished_folder, lambda path: hash_file(p_join(path, meta_file_name)))
+        for directory, meta, content_hash in metas:
+            if manifest.is_done("upload", directory, content_hash):
+                unchanged += 1
+                continue
+
+            missing = [muesli_id for muesli_id in meta.muesli_ids if muesli_id not in students]
+            for muesli_id in missing:
+                missing_ids[muesli_id] = directory
+
+            for muesli_id in meta.muesli_ids:
+                if muesli_id in students:
+                    student = students[muesli_id]
                     data[student.tutorial_id][muesli_id] = meta.credits_per_task
+                    if len(missing) == 0:
+                        directories[student.tutorial_id][directory] = content_hash
+
+        if unchanged > 0:
+            self.printer.inform(f"Skipped {unchanged} already uploaded submissions.")
+        report_missing_ids(self.printer, missing_ids)
 
         for tutorial_id, student_data in data.items():
             tutorial = self._storage.get_tutorial_by_id(tutorial_id)
@@ -529,6 +792,9 @@ class WorkflowUpload:
             if status:
                 self.printer.confirm("[Ok]", end="")
                 self.printer.inform(f" Changed {number_of_changes:>3d} entries.")
+                for directory, content_hash in directories[tutorial_id].items():
+                    manifest.mark_done("upload", directory, content_hash)
+                manifest.save()
             else:
                 self.printer.error("[Err]")
                 self.printer.error("Please check your connection state.")
@@ -562,71 +828,474 @@ class WorkflowSendMail:
 
     @property
     def help(self):
-        return "No help available."
+        return "Sends the consolidated feedback of an exercise to the students.\n" \
+               "Aliases:\n" \
+               "  ■ w.send\n" \
+               "Required Arguments:\n" \
+               "  ■ number of the exercise [type: int]\n" \
+               "Optional Flags:\n" \
+               "  ■ --resume: only send messages of the outbox that were not delivered yet or whose\n" \
+               "              feedback changed since they were spooled\n" \
+               "  ■ --debug: send every mail to yourself; the outbox is not touched\n" \
+               "Every message is spooled to the outbox of the exercise before it is sent. Delivered\n" \
+               "messages are never sent twice unless their feedback changed.\n" \
+               "Example usage:\n" \
+               "  workflow.send_feedback 3 --resume\n"
 
     def _parse_arguments(self, args):
-        if len(args) == 1:
-            exercise_number = int(args[0])
-            debug = False
-        else:
-            if args[0].lower() == '--debug':
-                debug = True
-                exercise_number = int(args[1])
-            else:
-                exercise_number = int(args[0])
-                debug = args[1].lower() == '--debug'
-
-                if not debug:
-                    raise ValueError(f'Unexpected flag {args[1]}')
-
-        return exercise_number, debug
+        flags = [arg.lower() for arg in args if arg.startswith('--')]
+        values = [arg for arg in args if not arg.startswith('--')]
+        for flag in flags:
+            if flag not in ('--debug', '--resume'):
+                raise ValueError(f'Unexpected flag {flag}')
+        if len(values) != 1:
+            raise ValueError(f'Expected exactly one exercise number, got {values}')
+
+        return int(values[0]), '--debug' in flags, '--resume' in flags
+
+    def _feedback_message(self, students):
+        message = list()
+        message.append("Dieses Feedback ist für:")
+        for student in students:
+            message.append(f"• {student.muesli_name} ({student.muesli_mail})")
+        message.append("")
+        message.append("Das Feedback befindet sich im Anhang.")
+        message.append("")
+        message.append(f"LG {self._storage.my_name_alias}")
+        return "\n".join(message)
+
+    def _attachments(self, path, feedback_file_name, meta_file_name):
+        others = sorted(file for file in os.listdir(path)
+                        if file not in (feedback_file_name, meta_file_name) and os.path.isfile(p_join(path, file)))
+        return [p_join(path, feedback_file_name)] + [p_join(path, file) for file in others]
 
     def __call__(self, *args):
-        exercise_number, debug = self._parse_arguments(args)
+        exercise_number, debug, resume = self._parse_arguments(args)
         if debug:
             self.printer.confirm("Running in debug mode.")
+            resume = False
 
         finished_folder = self._storage.get_finished_folder(exercise_number)
         feedback_file_name = f"{self._storage.muesli_data.feedback.file_name}.txt"
         meta_file_name = "meta.json"
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        unchanged = 0
+
+        students_by_id = self._storage.student_index()
+        missing_ids = dict()
+        metas = read_meta_files(
+            finished_folder,
+            lambda path: hash_files(p_join(path, meta_file_name),
+                                    *self._attachments(path, feedback_file_name, meta_file_name))
+        )
+        settings = delivery_settings(self._storage.mail_delivery_config)
+        archive_name = f"{self._storage.muesli_data.feedback.file_name}.zip" if settings.compress_attachments else None
+
+        outbox = self._storage.get_outbox(exercise_number)
+        domain = self._storage.email_account.address.split('@')[-1]
+        not_spooled = 0
+
+        jobs = list()
+        for directory, meta, content_hash in metas:
+            entry = outbox.get(directory)
+            if not debug:
+                if outbox.is_sent(directory, content_hash) \
+                        or (entry is None and manifest.is_done("send_feedback", directory, content_hash)):
+                    unchanged += 1
+                    continue
+                if resume and entry is None:
+                    not_spooled += 1
+                    continue
+
+            students = list()
+            for muesli_id in meta.muesli_ids:
+                if muesli_id in students_by_id:
+                    students.append(students_by_id[muesli_id])
+                else:
+                    missing_ids[muesli_id] = directory
+
+            if not debug and entry is not None and entry["hash"] == content_hash:
+                build = partial(outbox.load, directory)
+            else:
+                attachments = self._attachments(p_join(finished_folder, directory), feedback_file_name,
+                                                meta_file_name)
+                write_message = partial(write_feedback_mail, my_name=self._storage.my_name,
+                                        my_mail=self._storage.email_account.address, students=students,
+                                        message=self._feedback_message(students), attachment_paths=attachments,
+                                        exercise_prefix=self._storage.muesli_data.exercise_prefix,
+                                        exercise_number=exercise_number, debug=debug,
+                                        message_id=f'<{content_hash[:32]}@{domain}>', archive_name=archive_name)
+                if debug:
+                    build = partial(build_feedback_mail, **write_message.keywords)
+                else:
+                    build = partial(outbox.spool, directory, content_hash, write_message)
+
+            jobs.append(SimpleNamespace(directory=directory, content_hash=content_hash, students=students, build=build))
+
+        engine = DeliveryEngine(self._storage.email_account, settings)
+        sent = 0
+        for result in engine.deliver(jobs):
+            student_names = ', '.join([student.muesli_name for student in result.job.students])
+            self.printer.inform(f"Sending feedback to {student_names} ... ", end='')
+            if result.success:
+                sent += 1
+                self.printer.confirm("[Ok]")
+                for recipient, (code, response) in result.refused.items():
+                    self.printer.warning(f"  {recipient} was refused: {code} {response}")
+                if not debug:
+                    outbox.mark_sent(result.job.directory, result.attempts)
+                    manifest.mark_done("send_feedback", result.job.directory, result.job.content_hash)
+                    manifest.save()
+            else:
+                self.printer.error(f"[Err] - {result.error}")
+                if not debug and outbox.get(result.job.directory) is not None:
+                    outbox.mark_failed(result.job.directory, result.attempts, result.error)
+
+        if not_spooled > 0:
+            self.printer.inform(f"Ignored {not_spooled} feedback folders that were never spooled. "
+                                f"Run without --resume to send them.")
+        if len(jobs) > 0:
+            self.printer.inform(f"Sent {sent} of {len(jobs)} feedback mails.")
+        if unchanged > 0:
+            self.printer.inform(f"Skipped {unchanged} already sent feedback mails.")
+        report_missing_ids(self.printer, missing_ids)
+
+
+class WorkflowRunCommand:
+    STREAMING_STAGES = ("download", "unzip", "prepare")
+    BATCH_STAGES = ("consolidate", "upload", "send")
+
+    def __init__(self, printer, storage, muesli, moodle):
+        self.printer = printer
+        self._storage = storage
+        self._muesli = muesli
+        self._moodle = moodle
+        self._unzip = WorkflowUnzipCommand(printer, storage)
+        self._prepare = WorkflowPrepareCommand(printer, storage, muesli)
+
+        self._name = "workflow.run"
+        self._aliases = ("w.run",)
+        self._min_arg_count = 1
+        self._max_arg_count = 3
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def aliases(self):
+        return self._aliases
+
+    @property
+    def min_arg_count(self):
+        return self._min_arg_count
+
+    @property
+    def max_arg_count(self):
+        return self._max_arg_count
+
+    @property
+    def help(self):
+        return "Runs several workflow stages of an exercise as one pipeline.\n" \
+               "Every submission is unpacked and staged as soon as its download has finished.\n" \
+               "Aliases:\n" \
+               "  ■ w.run\n" \
+               "Required Arguments:\n" \
+               "  ■ number of the exercise [type: int]\n" \
+               "Optional Named Arguments:\n" \
+               "  ■ --stages: comma separated list of stages [default: download,unzip,prepare]\n" \
+               "              streaming stages: download, unzip, prepare (must be consecutive)\n" \
+               "              batch stages: consolidate, upload, send (run afterwards in this order)\n" \
+               "Worker counts are configured in the 'workflow' section of config.json.\n" \
+               "Example usage:\n" \
+               "  workflow.run 3 --stages download,unzip,prepare\n"
+
+    def _parse_arguments(self, args):
+        exercise_number = int(args[0])
+        stages = list(self.STREAMING_STAGES)
+        rest = list(args[1:])
+        if len(rest) > 0:
+            if rest[0].startswith("--stages="):
+                value = rest.pop(0)[len("--stages="):]
+            elif rest[0] == "--stages" and len(rest) == 2:
+                value = rest[1]
+                rest = list()
+            else:
+                raise ValueError(f"Unknown argument '{rest[0]}'")
+            if len(rest) > 0:
+                raise ValueError(f"Unknown argument '{rest[0]}'")
+
+            stages = [stage.strip() for stage in value.split(',') if len(stage.strip()) > 0]
+            unknown = [stage for stage in stages if stage not in self.STREAMING_STAGES + self.BATCH_STAGES]
+            if len(unknown) > 0:
+                raise ValueError(f"Unknown stages {unknown}")
+
+        streaming = [stage for stage in self.STREAMING_STAGES if stage in stages]
+        if len(streaming) > 0:
+            first = self.STREAMING_STAGES.index(streaming[0])
+            if list(self.STREAMING_STAGES[first:first + len(streaming)]) != streaming:
+                raise ValueError(f"The streaming stages {streaming} must be consecutive")
+
+        return exercise_number, streaming, [stage for stage in self.BATCH_STAGES if stage in stages]
+
+    def __call__(self, *args):
+        try:
+            exercise_number, streaming, batch = self._parse_arguments(args)
+        except ValueError as e:
+            self.printer.error(str(e))
+            return
+
+        if len(streaming) > 0:
+            self._run_pipeline(exercise_number, streaming)
+
+        if "consolidate" in batch:
+            WorkflowConsolidate(self.printer, self._storage)(str(exercise_number))
+        if "upload" in batch:
+            WorkflowUpload(self.printer, self._storage, self._muesli)(str(exercise_number))
+        if "send" in batch:
+            WorkflowSendMail(self.printer, self._storage)(str(exercise_number))
+
+    def _run_pipeline(self, exercise_number, streaming):
+        start = time.perf_counter()
+        settings = workflow_settings(self._storage.workflow_config)
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        limits = extraction_limits(self._storage.extraction_config)
+        stager = TreeStager(self._storage.staging_mode)
+        template = self._prepare.compile_template(exercise_number) if "prepare" in streaming else None
+        raw_folder = ensure_folder_exists(self._storage.get_raw_folder(exercise_number))
+        ensure_folder_exists(self._storage.get_preprocessed_folder(exercise_number))
+        claimed = dict()
+
+        stages = list()
+        if "download" in streaming:
+            submissions, my_students = self._storage.find_submissions_of_my_students(
+                self._moodle, exercise_number, self.printer
+            )
+            items = submissions
+            stages.append(PipelineStage(
+                "download",
+                lambda submission: self._storage.download_submission(self._moodle, submission, raw_folder),
+                workers=settings.download_workers
+            ))
+        elif "unzip" in streaming:
+            items = [os.path.join(raw_folder, file) for file in sorted(os.listdir(raw_folder))
+                     if file.endswith(ARCHIVE_EXTENSIONS)]
+        else:
+            preprocessed_folder = self._storage.get_preprocessed_folder(exercise_number)
+            items = [directory for directory in sorted(os.listdir(preprocessed_folder))
+                     if os.path.isdir(os.path.join(preprocessed_folder, directory))]
+
+        if "unzip" in streaming:
+            stages.append(PipelineStage(
+                "name",
+                lambda path: self._plan(path, exercise_number, manifest, limits, claimed),
+                on_main_thread=True
+            ))
+            stages.append(PipelineStage(
+                "unzip",
+                self._extract,
+                workers=settings.extraction_workers or os.cpu_count() or 1
+            ))
+            stages.append(PipelineStage(
+                "record",
+                lambda extraction: self._record(extraction, manifest),
+                on_main_thread=True
+            ))
+        if "prepare" in streaming:
+            stages.append(PipelineStage(
+                "prepare",
+                lambda directory: self._prepare.prepare_directory(directory, exercise_number, template, manifest,
+                                                                  stager),
+                on_main_thread=True
+            ))
+
+        total = len(items)
+        first_ready = None
+        pipeline = Pipeline(stages)
+        try:
+            for event in pipeline.run(items):
+                # a submission is ready once the last stage finished it, even if that stage is not printed
+                if first_ready is None and event.stage == stages[-1].name and event.error is None \
+                        and event.result is not None:
+                    first_ready = time.perf_counter() - start
+                if event.stage in ("name", "record") or (event.stage == "unzip" and event.error is None):
+                    continue
+
+                progress = event.progress
+                position = progress.done + progress.failed + progress.skipped
+                self.printer.inform(f"[{event.stage:<8} {position:>3}/{total}] {self._describe(event)} ", end='')
+                if event.error is not None:
+                    self.printer.error(f"[Err] - {event.error.__class__.__name__}: {event.error}")
+                elif event.result is None:
+                    self.printer.inform("[Skipped]")
+                else:
+                    self.printer.confirm(f"[{event.result}]" if event.stage == "prepare" else "[Ok]")
+        finally:
+            manifest.save()
+            self._storage.save_group_registry()
+            if "download" in streaming:
+                self._storage.save_submissions_meta(raw_folder, submissions, self.printer)
+
+        self.printer.inform("─" * 100)
+        for stage in stages:
+            if stage.name in ("name", "record"):
+                continue
+
+            progress = pipeline.progress[stage.name]
+            done, skipped, failed = progress.done, progress.skipped, progress.failed
+            if stage.name == "unzip":
+                recorded = pipeline.progress["record"]
+                done, failed = recorded.done, failed + recorded.skipped + recorded.failed
+            self.printer.inform(f"{stage.name:<10} {done:>4} done, {skipped:>4} skipped, {failed:>4} failed")
+        if stager.number_of_files > 0:
+            self.printer.inform(f"Staged {stager.summary}.")
+        if first_ready is not None:
+            self.printer.inform(f"First submission was ready after {first_ready:.1f}s.")
+        self.printer.inform(f"Finished after {time.perf_counter() - start:.1f}s.")
+
+    @staticmethod
+    def _describe(event):
+        item = event.item
+        if event.stage == "download":
+            return item.file_name
+        if event.stage == "unzip":
+            return item.file
+        return item
+
+    def _plan(self, path, exercise_number, manifest, limits, claimed):
+        plan = self._unzip.plan_file(path, exercise_number, manifest, limits, claimed)
+        if plan is None:
+            record = manifest.get("unzip", os.path.basename(path))
+            return SimpleNamespace(file=os.path.basename(path), directory=record["directory"], extracted=True)
+
+        plan.extracted = False
+        return plan
+
+    @staticmethod
+    def _extract(plan):
+        if plan.extracted:
+            return SimpleNamespace(plan=plan, result=None)
+        return SimpleNamespace(plan=plan, result=extract_in_subprocess(plan))
+
+    def _record(self, extraction, manifest):
+        if extraction.result is None:
+            return extraction.plan.directory
+
+        result = extraction.result
+        self._unzip.record_result(manifest, extraction.plan, result)
+        self._unzip.print_result(result)
+        return os.path.basename(result.target_path) if result.success else None
+
+
+class WorkflowStatusCommand:
+    def __init__(self, printer, storage):
+        self.printer = printer
+        self._storage = storage
+
+        self._name = "workflow.status"
+        self._aliases = ("w.stat",)
+        self._min_arg_count = 1
+        self._max_arg_count = 1
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def aliases(self):
+        return self._aliases
+
+    @property
+    def min_arg_count(self):
+        return self._min_arg_count
+
+    @property
+    def max_arg_count(self):
+        return self._max_arg_count
+
+    @property
+    def help(self):
+        return "Shows which workflow stages are done for every submission of an exercise.\n" \
+               "Aliases:\n" \
+               "  ■ w.stat\n" \
+               "Required Arguments:\n" \
+               "  ■ number of the exercise [type: int]\n" \
+               "Example usage:\n" \
+               "  workflow.status 3\n"
+
+    def __call__(self, *args):
+        try:
+            exercise_number = int(args[0])
+        except ValueError:
+            self.printer.error(f"Exercise number must be an integer, not '{args[0]}'")
+            return
+
+        manifest = self._storage.get_stage_manifest(exercise_number)
+        unzip_records = manifest.records("unzip")
+        archives_by_directory = {record["directory"]: file for file, record in unzip_records.items()
+                                 if "directory" in record}
+        directories = manifest.directories()
+
+        header = ["Submission"] + [stage for stage in STAGES]
+        columns = [directories]
+        for stage in STAGES:
+            column = list()
+            for directory in directories:
+                key = archives_by_directory.get(directory) if stage == "unzip" else directory
+                record = manifest.get(stage, key) if key is not None else None
+                if record is None:
+                    column.append("-")
+                else:
+                    column.append("done" if record["done"] else "failed")
+            columns.append(column)
+
+        if len(directories) == 0:
+            self.printer.inform(f"Nothing was processed for exercise {exercise_number} yet.")
+        else:
+            for line in string_table(header, columns, align_row='<'):
+                self.printer.inform(line)
+            self.printer.inform()
+
+        raw_folder = self._storage.get_raw_folder(exercise_number)
+        if os.path.exists(raw_folder):
+            archives = [file for file in os.listdir(raw_folder) if file.endswith(ARCHIVE_EXTENSIONS)]
+            pending = [file for file in archives if file not in unzip_records]
+            if len(pending) > 0:
+                self.printer.warning(f"{len(pending)} downloaded archives were not unpacked yet.")
+
+        for stage, column in zip(STAGES, columns[1:]):
+            done = column.count("done")
+            self.printer.inform(f"{stage:<15} {done:>4d} / {len(directories)} done", end='')
+            failed = column.count("failed")
+            if failed > 0:
+                self.printer.error(f" ({failed} failed)")
+            else:
+                self.printer.inform()
+
+
+def workflow_settings(config=None):
+    values = dict(DEFAULT_WORKFLOW_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    return SimpleNamespace(**values)
+
+
+def read_meta_files(finished_folder, content_hash_of, max_workers=8):
+    def read(directory):
+        path = p_join(finished_folder, directory)
+        with open(p_join(path, "meta.json"), 'r', encoding="utf-8") as fp:
+            meta = SimpleNamespace(**j_load(fp))
+        return directory, meta, content_hash_of(path)
+
+    directories = sorted(d for d in os.listdir(finished_folder) if os.path.isdir(p_join(finished_folder, d)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(read, directories))
+
 
-        with EMailSender(self._storage.email_account, self._storage.my_name) as sender:
-            for directory in os.listdir(finished_folder):
-                students = list()
-                with open(p_join(finished_folder, directory, meta_file_name), 'r', encoding="utf-8") as fp:
-                    meta = SimpleNamespace(**j_load(fp))
-
-                    for muesli_id in meta.muesli_ids:
-                        try:
-                            student = self._storage.get_student_by_muesli_id(muesli_id)
-                            students.append(student)
-                        except ValueError:
-                            self.printer.error(f"Did not find student with id {muesli_id}, maybe he left the tutorial?")
-
-                    feedback_path = p_join(finished_folder, directory, feedback_file_name)
-
-                    message = list()
-                    message.append("Dieses Feedback ist für:")
-                    for student in students:
-                        message.append(f"• {student.muesli_name} ({student.muesli_mail})")
-                    message.append("")
-                    message.append("Das Feedback befindet sich im Anhang.")
-                    message.append("")
-                    message.append(f"LG {self._storage.my_name_alias}")
-                    message = "\n".join(message)
-
-                    student_names = ', '.join([student.muesli_name for student in students])
-                    self.printer.inform(f"Sending feedback to {student_names} ... ", end='')
-                    try:
-                        sender.send_feedback(
-                            students,
-                            message,
-                            feedback_path,
-                            self._storage.muesli_data.exercise_prefix,
-                            exercise_number,
-                            debug=debug
-                        )
-                        self.printer.confirm("[Ok]")
-                    except BaseException as e:
-                        self.printer.error(f"[Err] - {e}")
+def report_missing_ids(printer, missing_ids):
+    if len(missing_ids) == 0:
+        return
 
+    printer.error(f"Did not find {len(missing_ids)} students, maybe they left the tutorial?")
+    for muesli_id, directory in sorted(missing_ids.items(), key=lambda item: item[1]):
+        printer.error(f"  ■ MÜSLI-Id {muesli_id} in '{directory}'")
@@ -1,3 +1,6 @@
+from importlib import import_module
+
+
 def normalize_string(string):
     if string.startswith('"') and string.endswith('"'):
         string = string[1:-1]
@@ -34,9 +37,12 @@ class CommandRegister:
         self._commands = dict()
         self._listed_commands = list()
         self._aliases = dict()
+        self._deferred = dict()
 
     @property
     def commands(self):
+        for name in list(self._deferred):
+            self._load_command(name)
         return self._commands.values()
 
     def register_command(self, command):
@@ -44,11 +50,23 @@ class CommandRegister:
         self._aliases.update({alias: command.name for alias in command.aliases})
         self._commands[command.name] = command
 
+    def register_deferred_command(self, name, aliases, module_name, class_name, *args):
+        self._aliases.update({alias: name for alias in aliases})
+        self._deferred[name] = (module_name, class_name, args)
+
     def get_command(self, name):
         if name in self._aliases:
             name = self._aliases[name]
 
+        if name in self._deferred:
+            self._load_command(name)
+
         if name not in self._commands:
             raise KeyError(f"Unknown command name or alias: '{name}'.")
 
         return self._commands[name]
+
+    def _load_command(self, name):
+        module_name, class_name, args = self._deferred.pop(name)
+        command_class = getattr(import_module(module_name), class_name)
+        self.register_command(command_class(*args))
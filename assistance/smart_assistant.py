@@ -1,73 +1,114 @@
-from assistance.command.connection import ConnectionCommand
-from assistance.command.crossover import ImportCommand, ExportCommand
+import sys
+
 from assistance.command.help import HelpCommand
-from assistance.command.info import InfoCommand
-from assistance.command.present import PresentCommand
 from assistance.command.stop import StopCommand
-from assistance.command.workflow import WorkflowDownloadCommand, WorkflowUnzipCommand, WorkflowPrepareCommand, \
-    WorkflowConsolidate, WorkflowUpload, WorkflowSendMail
 from assistance.commands import CommandRegister, parse_command, normalize_string
 from data.storage import InteractiveDataStorage
 from moodle.api import MoodleSession
 from muesli.api import MuesliSession
-from util.console import ConsoleFormatter, string_table
+from util.console import ConsoleFormatter, PrinterStream, console_settings, string_table
+from util.memory import MEMORY_PROFILER, memory_settings
+from util.metrics import HTTP_METRICS
+from util.session import LazySession
+from util.timing import TRACER, span, tracing_settings
 
 
 class SmartAssistant:
-    def __init__(self):
+    def __init__(self, output=None, pager=None):
         self._storage = InteractiveDataStorage()
-        self._printer = ConsoleFormatter()
-        self._muesli = MuesliSession(account=self._storage.muesli_account)
-        self._moodle = MoodleSession(account=self._storage.moodle_account)
+        self._console = console_settings(self._storage.console_config)
+        if output is not None:
+            self._console.output = output
+        if pager is not None:
+            self._console.pager = pager
+        self._stdout = sys.stdout
+        self._printer = ConsoleFormatter(self._console.output, self._console.pager, self._console.flush_interval,
+                                         self._stdout)
+        # direct prints, e.g. of the storage initialisation, have to go through the printer as well
+        sys.stdout = PrinterStream(self._printer, self._stdout)
+        physical_storage = self._storage.physical_storage
+        self._muesli = LazySession(MuesliSession(account=self._storage.muesli_account), "MÜSLI",
+                                   physical_storage, "muesli")
+        self._moodle = LazySession(MoodleSession(account=self._storage.moodle_account), "Moodle",
+                                   physical_storage, "moodle")
         self._command_register = CommandRegister()
+        self._tracing = tracing_settings(self._storage.tracing_config)
+        TRACER.configure(self._tracing)
+        self._memory = memory_settings(self._storage.memory_config)
+        if self._memory.sample_folder is None:
+            self._memory.sample_folder = physical_storage.get_memory_folder()
+        if self._memory.trace_on_startup or self._memory.sample_interval:
+            MEMORY_PROFILER.start(self._memory.frames)
+        if self._memory.sample_interval:
+            MEMORY_PROFILER.start_sampler(self._memory.sample_interval, self._memory.sample_folder,
+                                          self._memory.max_samples)
         self.ready = True
 
-        self._initialize_connections()
-        self._initialize_storage()
+        with span("startup"):
+            self._initialize_connections()
+            self._initialize_storage()
         self._command_register.register_command(StopCommand(self._printer, self._stop))
         self._command_register.register_command(HelpCommand(self._printer, self._command_register))
-        self._command_register.register_command(InfoCommand(self._printer, self._storage))
-        self._command_register.register_command(ConnectionCommand(self._printer, self._moodle, self._muesli))
-
-        self._command_register.register_command(
-            WorkflowDownloadCommand(self._printer, self._storage.download_submissions_of_my_students, self._moodle))
-        self._command_register.register_command(WorkflowUnzipCommand(self._printer, self._storage))
-        self._command_register.register_command(WorkflowPrepareCommand(self._printer, self._storage, self._muesli))
-        self._command_register.register_command(WorkflowConsolidate(self._printer, self._storage))
-        self._command_register.register_command(WorkflowUpload(self._printer, self._storage, self._muesli))
-        self._command_register.register_command(WorkflowSendMail(self._printer, self._storage))
-
-        self._command_register.register_command(ImportCommand(self._printer, self._storage))
-        self._command_register.register_command(ExportCommand(self._printer, self._storage))
-        self._command_register.register_command(PresentCommand(self._printer, self._storage, self._muesli))
-
+        self._register_deferred("information", ("info",), "info", "InfoCommand", self._storage)
+        self._register_deferred("connection", ("conn",), "connection", "ConnectionCommand",
+                                self._moodle, self._muesli)
+
+        self._register_deferred("workflow.download", ("w.down",), "workflow", "WorkflowDownloadCommand",
+                                self._storage.download_submissions_of_my_students, self._moodle)
+        self._register_deferred("workflow.unzip", ("w.uz",), "workflow", "WorkflowUnzipCommand", self._storage)
+        self._register_deferred("workflow.prepare", ("w.prep",), "workflow", "WorkflowPrepareCommand",
+                                self._storage, self._muesli)
+        self._register_deferred("workflow.consolidate", ("w.cons",), "workflow", "WorkflowConsolidate",
+                                self._storage)
+        self._register_deferred("workflow.upload", ("w.up",), "workflow", "WorkflowUpload",
+                                self._storage, self._muesli)
+        self._register_deferred("workflow.send_feedback", ("w.send",), "workflow", "WorkflowSendMail",
+                                self._storage)
+        self._register_deferred("workflow.status", ("w.stat",), "workflow", "WorkflowStatusCommand",
+                                self._storage)
+        self._register_deferred("workflow.run", ("w.run",), "workflow", "WorkflowRunCommand",
+                                self._storage, self._muesli, self._moodle)
+
+        self._register_deferred("import", ("<-",), "crossover", "ImportCommand", self._storage)
+        self._register_deferred("export", ("->",), "crossover", "ExportCommand", self._storage)
+        self._register_deferred("presented", ("pres", "[x]"), "present", "PresentCommand",
+                                self._storage, self._muesli)
+        self._register_deferred("statistics", ("stats",), "stats", "StatsCommand", TRACER)
+        self._register_deferred("memory", ("mem",), "memory", "MemoryCommand", MEMORY_PROFILER, self._memory)
+
+    def _register_deferred(self, name, aliases, module_name, class_name, *args):
+        self._command_register.register_deferred_command(
+            name, aliases, f"assistance.command.{module_name}", class_name, self._printer, *args)
 
     def _initialize_connections(self):
         self._print_header("Initializing Connections")
-        self._open_connection_to(self._muesli)
-        self._open_connection_to(self._moodle)
-        print()
+        for session in (self._muesli, self._moodle):
+            session.login_in_background()
+        self._printer.inform("Logging in to MÜSLI and Moodle in the background...")
+        self._printer.inform()
 
     def _print_header(self, title):
         self._printer.inform('┌' + '─' * 120 + '┐')
         self._printer.inform(f'│{title:^120}│')
         self._printer.inform('└' + '─' * 120 + '┘')
 
-    def _open_connection_to(self, session):
-        self._printer.inform(f'Current state: {session.name}')
-        if not session.online:
-            with self._printer as printer:
-                printer.inform("Logging in...", end='')
-                try:
-                    session.login()
-                    printer.confirm("[Success]")
-                except ConnectionRefusedError as e:
-                    printer.error(f"[Error] - {e}")
+    def _print_connection_states(self):
+        for session in (self._muesli, self._moodle):
+            self._printer.inform(f'{session.title}: ', end='')
+            state = session.state
+            if state == 'online':
+                self._printer.confirm(f'{state} (restored session)' if session.resumed else state)
+            elif state == 'logging in':
+                self._printer.warning(state)
+            else:
+                self._printer.error(f'{state} - {session.error}' if session.error is not None else state)
 
     def _initialize_storage(self):
         self._print_header("Initializing Storage")
         self._storage.init_data(self._muesli, self._moodle)
         self._printer.inform()
+        self._print_connection_states()
+        self._printer.inform()
 
     def hello(self):
         def my_tutorial_to_str(my_tutorial):
@@ -100,16 +141,18 @@ class SmartAssistant:
 
         self._printer.inform("Enter a command or use 'help' / '?' to list all available commands.")
         self._printer.inform()
+        self._printer.flush()
 
     def execute_cycle(self):
-        command = input(">: ")
+        command = self._printer.input(">: ")
         with self._printer as printer:
             try:
                 name, args = parse_command(command)
                 command = self._command_register.get_command(name)
 
                 if command.min_arg_count <= len(args) <= command.max_arg_count:
-                    command(*args)
+                    with span(f"command.{command.name}"), HTTP_METRICS.attributed_to(command.name):
+                        command(*args)
                 else:
                     if command.min_arg_count == command.max_arg_count:
                         limitation = f"exactly {command.min_arg_count}"
@@ -126,12 +169,23 @@ class SmartAssistant:
                 self._printer.error(f'{e.__class__.__name__}: {e}')
 
         self._printer.inform()
+        self._printer.flush(page=True)
 
-    def _stop(self):
+    def _stop(self, keep_session=False):
         self.ready = False
-        self._printer.inform("Close connections ...", end='')
-        self._moodle.logout()
-        self._muesli.logout()
+        if keep_session:
+            self._printer.inform("Keep sessions ...", end='')
+        else:
+            self._printer.inform("Close connections ...", end='')
+        self._moodle.logout(keep_session=keep_session)
+        self._muesli.logout(keep_session=keep_session)
         self._printer.inform("[OK]")
+        MEMORY_PROFILER.stop_sampler()
+        if self._tracing.trace_file:
+            self._printer.inform(f"Write trace to '{self._tracing.trace_file}' ...", end='')
+            TRACER.export_chrome_trace(self._tracing.trace_file)
+            self._printer.inform("[OK]")
         self._printer.outdent()
         self._print_header("Have a nice day \\(^_^)/")
+        self._printer.flush()
+        sys.stdout = self._stdout
@@ -0,0 +1,181 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmark.synthetic import generate_lecture, match_all
+from data.data import Student
+from data.storage import InteractiveDataStorage, PhysicalDataStorage, match_student
+from data.student_matching import match_students
+
+SIZES = (100, 1000, 10000)
+QUERIES = ("Müller", "anna-lena", "Jörg Schäfer", "garcia", "Nobody Unknown")
+
+
+def make_storage(lecture):
+    storage = object.__new__(InteractiveDataStorage)
+    storage.my_tutorial_ids = lecture.my_tutorial_ids
+    storage.other_tutorial_ids = lecture.other_tutorial_ids
+    storage.tutorials = lecture.tutorials
+    storage.students = lecture.students
+    storage.imported_students = [students[0].muesli_student_id for tutorial_id, students in lecture.students.items()
+                                 if tutorial_id in lecture.other_tutorial_ids][:5]
+    storage.exported_students = [lecture.students[lecture.my_tutorial_ids[0]][0].muesli_student_id]
+    return storage
+
+
+def case_match_student(lecture, storage, folder):
+    all_students = storage.all_students
+    return lambda: [match_student(query, all_students) for query in QUERIES]
+
+
+def case_get_students_by_name(lecture, storage, folder):
+    return lambda: [storage.get_students_by_name(query, mode) for query in QUERIES for mode in ('my', 'other')]
+
+
+def case_my_and_other_students(lecture, storage, folder):
+    return lambda: (storage.my_students, storage.other_students)
+
+
+def case_match_students(lecture, storage, folder):
+    def run():
+        all_students = [Student.from_json(dict(student.to_json_dict(), moodle_student_id=None, moodle_name=None,
+                                               moodle_mail=None)) for student in storage.all_students]
+        still_to_match = sorted(enumerate(all_students), key=lambda pair: pair[1].muesli_mail)
+        with contextlib.redirect_stdout(io.StringIO()):
+            match_students(all_students, still_to_match, list(lecture.moodle_participants))
+        return len(still_to_match)
+
+    return run
+
+
+def case_storage_save_load(lecture, storage, folder):
+    physical_storage = PhysicalDataStorage(SimpleNamespace(root=os.path.join(folder, str(len(storage.all_students)))))
+
+    def run():
+        for tutorial_id in lecture.students:
+            physical_storage.save_students(tutorial_id, lecture.students)
+        return sum(len(physical_storage.load_students(tutorial_id)[0]) for tutorial_id in lecture.students)
+
+    return run
+
+
+def case_student_from_json(lecture, storage, folder):
+    dictionaries = [student.to_json_dict() for student in storage.all_students]
+    return lambda: [Student.from_json(dictionary) for dictionary in dictionaries]
+
+
+CASES = {
+    "match_student": case_match_student,
+    "get_students_by_name": case_get_students_by_name,
+    "my_and_other_students": case_my_and_other_students,
+    "match_students": case_match_students,
+    "storage_save_load": case_storage_save_load,
+    "student_from_json": case_student_from_json
+}
+QUADRATIC_CASES = ("match_students",)
+
+
+def measure(run, repeat):
+    timings = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(timings), sorted(timings)[len(timings) // 2], peak
+
+
+def git_commit():
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes, cases, repeat, max_quadratic_size):
+    with tempfile.TemporaryDirectory() as folder:
+        return [result for size in sizes for result in run_size(size, cases, repeat, max_quadratic_size, folder)]
+
+
+def run_size(size, cases, repeat, max_quadratic_size, folder):
+    results = list()
+    lecture = match_all(generate_lecture(size))
+    storage = make_storage(lecture)
+    for name in cases:
+        if name in QUADRATIC_CASES and size > max_quadratic_size:
+            print(f"{name:<24}{size:>7d}   skipped (raise --max-quadratic-size to include)")
+            continue
+
+        best, median, peak = measure(CASES[name](lecture, storage, folder),
+                                     1 if name in QUADRATIC_CASES else repeat)
+        print(f"{name:<24}{size:>7d}{best * 1000:>12.2f}{median * 1000:>12.2f}{peak / 1024:>12.0f}")
+        results.append({"case": name, "size": size, "best_seconds": best, "median_seconds": median,
+                        "peak_bytes": peak})
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as fp:
+        baseline = json.load(fp)
+    previous = {(entry["case"], entry["size"]): entry for entry in baseline["results"]}
+
+    print()
+    print(f"Compared to {baseline_path} (commit {baseline.get('commit')}):")
+    print(f"{'case':<24}{'size':>7}{'time':>10}{'memory':>10}")
+    for entry in results:
+        old = previous.get((entry["case"], entry["size"]))
+        if old is not None:
+            time_ratio = entry["best_seconds"] / old["best_seconds"] if old["best_seconds"] > 0 else float('nan')
+            memory_ratio = entry["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] > 0 else float('nan')
+            print(f"{entry['case']:<24}{entry['size']:>7d}{time_ratio:>9.2f}x{memory_ratio:>9.2f}x")
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the data layer on a synthetic lecture.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-quadratic-size', type=int, default=max(SIZES))
+    parser.add_argument('--output', help="JSON file for the results (default: data_layer_<commit>.json)")
+    parser.add_argument('--compare', help="JSON file of a previous run to compare with")
+    arguments = parser.parse_args(arguments)
+
+    commit = git_commit()
+    print(f"{'case':<24}{'size':>7}{'best [ms]':>12}{'median [ms]':>12}{'peak [KiB]':>12}")
+    results = run_suite(arguments.sizes, arguments.cases, arguments.repeat, arguments.max_quadratic_size)
+
+    output = arguments.output or f"data_layer_{commit or 'unknown'}.json"
+    with open(output, 'w', encoding='utf-8') as fp:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": arguments.repeat,
+            "results": results
+        }, fp, indent=4)
+    print(f"Results written to {output}")
+
+    if arguments.compare:
+        compare(results, arguments.compare)
+
+
+if __name__ == '__main__':
+    main()
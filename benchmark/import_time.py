@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+ENTRY_MODULE = 'assistance.smart_assistant'
+DEFERRED_MODULES = ('bs4', 'requests', 'py7zr', 'lzma', 'tarfile', 'multiprocessing', 'smtplib',
+                    'assistance.command.workflow', 'mail.mail_out', 'mail.delivery', 'util.archive', 'util.feedback')
+
+
+def measure_imports(module_name=ENTRY_MODULE):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                               cwd=root, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, check=True)
+
+    imports = dict()
+    for line in completed.stderr.decode('utf-8', 'replace').splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        imports[name.strip()] = (int(self_time), int(cumulative))
+
+    return imports
+
+
+def main(runs=5, top=15):
+    totals = list()
+    for _ in range(runs):
+        imports = measure_imports()
+        totals.append(sum(self_time for self_time, _ in imports.values()))
+
+    print(f"Importing {ENTRY_MODULE} loads {len(imports)} modules.")
+    print(f"Total import time over {runs} runs: best {min(totals) / 1000:.1f}ms, "
+          f"median {sorted(totals)[len(totals) // 2] / 1000:.1f}ms")
+    print()
+    print(f"{'cumulative [ms]':>16} {'self [ms]':>10}  module")
+    ranking = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_time, cumulative) in ranking[:top]:
+        print(f"{cumulative / 1000:>16.1f} {self_time / 1000:>10.1f}  {name}")
+
+    eager = [name for name in DEFERRED_MODULES if name in imports]
+    print()
+    if len(eager) > 0:
+        print(f"Regression: imported at startup although deferred: {', '.join(eager)}")
+        return 1
+
+    print("No deferred module is imported at startup.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*[int(arg) for arg in sys.argv[1:]]))
@@ -0,0 +1,155 @@
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from moodle.table_parser import iter_table_rows, has_classes, first_table, participant_from_row, \
+    submission_from_row
+
+STUDENT_ROLE = 'Teilnehmer/in'
+
+
+class SilentPrinter:
+    def warning(self, warning, end='\n'):
+        pass
+
+
+def generate_participant_page(number_of_rows, seed=0):
+    rng = random.Random(seed)
+    rows = list()
+    for i in range(number_of_rows):
+        role = STUDENT_ROLE if rng.random() < 0.95 else 'Tutor/in'
+        rows.append(
+            '<tr>'
+            f'<td class="cell c0"><input type="checkbox" name="user{i}" value="{i}"></td>'
+            f'<td class="cell c1"><a href="https://moodle.uni-heidelberg.de/user/view.php?id={10000 + i}&amp;course=1">'
+            f'<img src="pic.png" alt="">Studentin Nummer {i}</a></td>'
+            f'<td class="cell c2">student{i}@stud.uni-heidelberg.de</td>'
+            f'<td class="cell c3">{role}</td>'
+            '<td class="cell c4">Keine Gruppen</td>'
+            '<td class="cell c5">vor 3 Tagen</td>'
+            '</tr>'
+        )
+
+    return '<html><body><div class="navbar">' + '<a href="#">x</a>' * 200 + '</div>' \
+           '<table class="flexible generaltable generalbox"><thead><tr><th>Name</th></tr></thead><tbody>' \
+           + ''.join(rows) + '</tbody></table></body></html>'
+
+
+def generate_grading_page(number_of_rows, seed=0):
+    rng = random.Random(seed)
+    rows = list()
+    for i in range(number_of_rows):
+        files = ''
+        if rng.random() < 0.8:
+            files = f'<div><a target="_blank" href="https://moodle.uni-heidelberg.de/pluginfile.php/{i}/' \
+                    f'Abgabe_{i}_ex01.zip?forcedownload=1">Abgabe_{i}_ex01.zip</a></div>'
+        columns = [
+            f'<input type="checkbox" name="selectedusers" value="{10000 + i}">',
+            '<img src="pic.png">',
+            f'<a href="https://moodle.uni-heidelberg.de/user/view.php?id={10000 + i}">Studentin Nummer {i}</a>',
+            f'student{i}@stud.uni-heidelberg.de',
+            'Zur Bewertung eingereicht',
+            '-',
+            '<a href="#">Bewertung</a>',
+            'Montag, 1. Januar 2020, 12:00',
+            files,
+            '-'
+        ]
+        rows.append('<tr>' + ''.join(f'<td class="cell c{j}">{c}</td>' for j, c in enumerate(columns)) + '</tr>')
+
+    return '<html><body><form><input type="hidden" name="contextid" value="1"></form>' \
+           '<table class="flexible generaltable generalbox"><tbody>' + ''.join(rows) + '</tbody></table></body></html>'
+
+
+def chunked(text, chunk_size=64 * 1024):
+    for i in range(0, len(text), chunk_size):
+        yield text[i:i + chunk_size]
+
+
+def parse_participants_streaming(page):
+    rows = iter_table_rows(chunked(page), has_classes('flexible', 'generaltable', 'generalbox'))
+    return [student for student in (participant_from_row(row, STUDENT_ROLE) for row in rows) if student is not None]
+
+
+def parse_submissions_streaming(page):
+    printer = SilentPrinter()
+    rows = iter_table_rows(chunked(page), first_table)
+    return [submission for submission in (submission_from_row(row, printer) for row in rows)
+            if submission is not None]
+
+
+def parse_participants_soup(page):
+    from bs4 import BeautifulSoup
+    import re
+
+    soup = BeautifulSoup(page, 'html.parser')
+    table = soup.find('table', attrs={'class': 'flexible generaltable generalbox'}).find('tbody')
+    students = list()
+    for row in table.find_all('tr'):
+        columns = row.find_all('td')
+        anchor = columns[1].find('a')
+        if anchor is not None and columns[3].text == STUDENT_ROLE:
+            moodle_id = re.search(r'.*id=(\d+)&.*', anchor['href']).group(1)
+            students.append((int(moodle_id), columns[1].text, columns[2].text))
+    return students
+
+
+def parse_submissions_soup(page):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page, 'html.parser')
+    result = list()
+    for row in soup.find('table').find('tbody').find_all('tr'):
+        columns = row.find_all('td')
+        download_anchor = columns[8].find_all('a', attrs={'target': '_blank'})
+        if len(download_anchor) > 0:
+            result.append(SimpleNamespace(
+                moodle_student_id=int(columns[0].find('input', attrs={'type': 'checkbox'})['value']),
+                file_name=download_anchor[-1].text,
+                url=download_anchor[-1]['href']
+            ))
+    return result
+
+
+def measure(function, page):
+    start = time.perf_counter()
+    result = function(page)
+    duration = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return len(result), duration, peak
+
+
+def main(number_of_rows=5000):
+    pages = {
+        'participants': (generate_participant_page(number_of_rows), parse_participants_streaming,
+                         parse_participants_soup),
+        'grading': (generate_grading_page(number_of_rows), parse_submissions_streaming, parse_submissions_soup)
+    }
+
+    try:
+        import bs4
+        has_bs4 = True
+    except ImportError:
+        has_bs4 = False
+
+    print(f"{'table':<14}{'parser':<12}{'page [MB]':>10}{'rows':>8}{'time [s]':>10}{'peak [MB]':>11}")
+    for name, (page, streaming, soup) in pages.items():
+        parsers = [('streaming', streaming)] + ([('soup', soup)] if has_bs4 else [])
+        for parser_name, parser in parsers:
+            rows, duration, peak = measure(parser, page)
+            print(f"{name:<14}{parser_name:<12}{len(page) / 2 ** 20:>10.2f}{rows:>8d}{duration:>10.3f}"
+                  f"{peak / 2 ** 20:>11.2f}")
+
+    if not has_bs4:
+        print("bs4 is not installed - skipped the BeautifulSoup baseline.")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
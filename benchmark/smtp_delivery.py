@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+from smtplib import SMTP
+from types import SimpleNamespace
+
+from benchmark.smtp_sink import SMTPSink
+from mail.delivery import DeliveryEngine, delivery_settings
+from mail.mail_out import build_feedback_mail
+
+
+def generate_feedback(folder, number_of_mails, feedback_size):
+    jobs = list()
+    line = ('x' * 99) + '\n'
+    for i in range(number_of_mails):
+        path = os.path.join(folder, f'Feedback_{i}.txt')
+        with open(path, 'w', encoding='utf-8') as fp:
+            fp.write(line * (feedback_size // len(line)))
+
+        students = [SimpleNamespace(muesli_name=f'Studentin {i}-{j}', muesli_mail=f'student{i}-{j}@example.org')
+                    for j in range(2)]
+        jobs.append(SimpleNamespace(
+            directory=f'Group_{i}',
+            students=students,
+            build=partial(build_feedback_mail, 'Tina Tutor', 'tutor@example.org', students, 'Feedback im Anhang.',
+                          [path], 'Übung', 1)
+        ))
+    return jobs
+
+
+def send_serial(account, jobs):
+    smtp = SMTP(account.mail_server.outgoing.host, account.mail_server.outgoing.port)
+    smtp.login(account.user, account.password)
+    for job in jobs:
+        mail = job.build()
+        smtp.sendmail(mail.from_addr, mail.to_addrs, mail.data)
+    smtp.quit()
+    return len(jobs)
+
+
+def send_pooled(account, jobs, connections):
+    settings = delivery_settings(SimpleNamespace(connections=connections, starttls=False, retry_delay=0.1))
+    return sum(result.success for result in DeliveryEngine(account, settings).deliver(jobs))
+
+
+def main(number_of_mails=100, latency_ms=5, feedback_size=16 * 1024):
+    with tempfile.TemporaryDirectory() as folder:
+        jobs = generate_feedback(folder, number_of_mails, feedback_size)
+        runs = [('serial', send_serial)] + [(f'pool x{n}', partial(send_pooled, connections=n)) for n in (1, 2, 4, 8)]
+
+        print(f"{number_of_mails} mails, {feedback_size / 1024:.0f} KB attachment, {latency_ms} ms per SMTP reply")
+        print(f"{'mode':<10}{'sent':>6}{'time [s]':>10}{'mails/s':>10}")
+        for name, run in runs:
+            with SMTPSink(latency=latency_ms / 1000) as sink:
+                start = time.perf_counter()
+                sent = run(sink.account(), jobs)
+                duration = time.perf_counter() - start
+            print(f"{name:<10}{sent:>6d}{duration:>10.3f}{sent / duration:>10.1f}")
+
+        with SMTPSink(latency=latency_ms / 1000, disconnect_every=7) as sink:
+            start = time.perf_counter()
+            sent = send_pooled(sink.account(), jobs, connections=4)
+            duration = time.perf_counter() - start
+        print(f"pool x4 with a 421 reply on every 7th mail: {sent} of {number_of_mails} sent in {duration:.3f}s")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,110 @@
+import socketserver
+import threading
+import time
+from types import SimpleNamespace
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self._reply("220 localhost SMTP sink")
+        mail_from, recipients = None, list()
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN\r\n250-8BITMIME\r\n')
+                self._reply("250 SIZE 104857600")
+            elif verb == 'HELO':
+                self._reply("250 localhost")
+            elif verb == 'AUTH':
+                self._reply("235 Authentication successful")
+            elif verb == 'MAIL':
+                mail_from, recipients = command[10:].strip(), list()
+                self._reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip())
+                self._reply("250 OK")
+            elif verb == 'DATA':
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if self.server.record(mail_from, recipients, data):
+                    self._reply("250 OK queued")
+                else:
+                    self._reply("421 Too many messages, closing connection")
+                    return
+            elif verb == 'RSET':
+                mail_from, recipients = None, list()
+                self._reply("250 OK")
+            elif verb == 'NOOP':
+                self._reply("250 OK")
+            elif verb == 'QUIT':
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+    def _read_data(self):
+        lines = list()
+        while True:
+            line = self.rfile.readline()
+            if not line or line == b'.\r\n':
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, disconnect_every=None, keep_messages=False, port=0):
+        super().__init__(('127.0.0.1', port), SMTPSinkHandler)
+        self.latency = latency
+        self.disconnect_every = disconnect_every
+        self.keep_messages = keep_messages
+        self.messages = list()
+        self.number_of_messages = 0
+        self.number_of_bytes = 0
+        self._transactions = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def account(self):
+        outgoing = SimpleNamespace(host='127.0.0.1', port=self.port)
+        return SimpleNamespace(user='tutor', password='secret', address='tutor@example.org',
+                               mail_server=SimpleNamespace(outgoing=outgoing))
+
+    def record(self, mail_from, recipients, data):
+        with self._lock:
+            self._transactions += 1
+            if self.disconnect_every and self._transactions % self.disconnect_every == 0:
+                return False
+
+            self.number_of_messages += 1
+            self.number_of_bytes += len(data)
+            if self.keep_messages:
+                self.messages.append(SimpleNamespace(mail_from=mail_from, recipients=recipients, data=data))
+            return True
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
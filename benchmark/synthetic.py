@@ -0,0 +1,193 @@
+import io
+import os
+import random
+import tarfile
+import zipfile
+from types import SimpleNamespace
+
+from data.data import Student, Tutorial
+
+FIRST_NAMES = ("Max", "Erika", "Jörg", "Anna-Lena", "Zoë", "René", "Björn", "Jürgen", "Özlem", "Marie-Luise",
+               "Hans-Peter", "Sören", "Chloé", "François", "Ümit", "Käthe", "Lea", "Jonas", "Lukas", "Hannah",
+               "Noah", "Mia", "Leon", "Sophie", "Ella", "Emil", "Mathéo", "Agnieszka", "Tomáš", "Dragoş")
+MIDDLE_NAMES = ("Maria", "Johannes", "Luise", "Friedrich", "Sophie", "Alexander")
+LAST_NAMES = ("Müller", "Schäfer", "Groß", "Weiß", "Meyer-Lüdenscheidt", "Çelik", "Dvořák", "García López",
+              "von der Heide", "Schmidt", "Schneider", "Fischer", "Weber", "Wagner", "Becker", "Hoffmann", "Köhler",
+              "Krüger", "Böhm", "Jäger", "Günther", "Lefèvre", "Nowak", "Şahin", "Yılmaz", "Zimmermann", "Bäcker",
+              "Fuchs-Übelacker", "Østergaard", "Kowalczyk")
+NAMING_VARIANTS = (("correct", 0.6), ("hyphen_suffix", 0.15), ("short_number", 0.1), ("no_suffix", 0.1),
+                   ("unreadable", 0.05))
+ARCHIVE_VARIANTS = (("zip", 0.55), ("tar.gz", 0.2), ("7z", 0.1), ("mislabelled", 0.15))
+SUBJECTS = ("Informatik", "Mathematik", "Physik", "Computerlinguistik", "Scientific Computing")
+TIMES = ("Mo 09:15", "Mo 11:15", "Di 14:15", "Mi 16:15", "Do 09:15", "Fr 11:15")
+
+
+def ascii_mail_part(text):
+    text = text.lower().replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue').replace('ß', 'ss')
+    return ''.join(c for c in text if c.isascii() and c.isalnum())
+
+
+def random_name(rng):
+    parts = [rng.choice(FIRST_NAMES)]
+    if rng.random() < 0.15:
+        parts.append(rng.choice(MIDDLE_NAMES))
+    parts.append(rng.choice(LAST_NAMES))
+    return ' '.join(parts)
+
+
+def moodle_variant(rng, name):
+    parts = name.split()
+    roll = rng.random()
+    if roll < 0.6:
+        return name
+    elif roll < 0.75:
+        return ' '.join([parts[0], parts[-1]])
+    elif roll < 0.9:
+        return name.replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue').replace('ß', 'ss')
+    else:
+        return name.upper() if rng.random() < 0.5 else name.lower()
+
+
+def generate_lecture(number_of_students, students_per_tutorial=25, my_tutorials=2, moodle_ratio=0.95, seed=0):
+    rng = random.Random(seed)
+    number_of_tutorials = max(1, -(-number_of_students // students_per_tutorial))
+
+    tutorials = dict()
+    for tutorial_id in range(1, number_of_tutorials + 1):
+        tutor = "Tina Tutor" if tutorial_id <= my_tutorials else random_name(rng)
+        tutorials[tutorial_id] = Tutorial("Algorithmen und Datenstrukturen", 1171, tutorial_id, tutor,
+                                          rng.choice(TIMES), f"INF {rng.randint(200, 350)} / SR {rng.randint(1, 9)}")
+
+    students = {tutorial_id: list() for tutorial_id in tutorials}
+    moodle_participants = list()
+    for i in range(number_of_students):
+        tutorial_id = i // students_per_tutorial + 1
+        name = random_name(rng)
+        parts = name.split()
+        mail = f'{ascii_mail_part(parts[0])}.{ascii_mail_part(parts[-1])}{i}@stud.uni-heidelberg.de'
+        students[tutorial_id].append(Student(tutorial_id, 100000 + i, name, mail, rng.choice(SUBJECTS)))
+
+        if rng.random() < moodle_ratio:
+            moodle_mail = mail if rng.random() < 0.7 else f'{ascii_mail_part(parts[-1])}{i}@uni-heidelberg.de'
+            moodle_participants.append((500000 + i, moodle_variant(rng, name), moodle_mail))
+
+    for i in range(int(number_of_students * (1 - moodle_ratio))):
+        moodle_participants.append((900000 + i, random_name(rng), f'guest{i}@uni-heidelberg.de'))
+    rng.shuffle(moodle_participants)
+
+    return SimpleNamespace(
+        tutorials=tutorials,
+        students=students,
+        moodle_participants=moodle_participants,
+        my_tutorial_ids=list(range(1, min(my_tutorials, number_of_tutorials) + 1)),
+        other_tutorial_ids=list(range(my_tutorials + 1, number_of_tutorials + 1))
+    )
+
+
+def match_all(lecture):
+    by_mail = {mail: (moodle_id, name, mail) for moodle_id, name, mail in lecture.moodle_participants}
+    for students in lecture.students.values():
+        for student in students:
+            participant = by_mail.get(student.muesli_mail)
+            if participant is not None:
+                student.set_moodle_identity(*participant)
+    return lecture
+
+
+def _weighted_choice(rng, variants):
+    roll, total = rng.random(), 0.0
+    for name, weight in variants:
+        total += weight
+        if roll < total:
+            return name
+    return variants[-1][0]
+
+
+def _name_part(name):
+    parts = name.split()
+    return f'{parts[0].replace("-", "")}-{parts[-1].replace("-", "")}'
+
+
+def submission_file_name(rng, students, exercise_number):
+    variant = _weighted_choice(rng, NAMING_VARIANTS)
+    names = '_'.join(_name_part(student.muesli_name) for student in students)
+    if variant == "correct":
+        return variant, f'{names}_ex{exercise_number:02d}'
+    elif variant == "hyphen_suffix":
+        return variant, f'{names}-ex{exercise_number:02d}'
+    elif variant == "short_number":
+        return variant, f'{names}_ex{exercise_number}'
+    elif variant == "no_suffix":
+        return variant, names
+    else:
+        return variant, f'abgabe_blatt{exercise_number}_gruppe{rng.randint(1, 99)}'
+
+
+def submission_files(rng, exercise_number, file_size, nested):
+    prefix = f'Abgabe/ex{exercise_number:02d}/' if nested else ''
+    source = ''.join(f'def task_{i}(values):\n    return sorted(values)[:{i}]\n\n' for i in range(rng.randint(20, 80)))
+    files = {
+        f'{prefix}main.py': source.encode('utf-8'),
+        f'{prefix}README.md': 'Lösungen zu Übung {}\n'.format(exercise_number).encode('utf-8') * 20,
+        f'{prefix}{"src/util/" if nested else ""}helpers.py': source[:len(source) // 2].encode('utf-8'),
+        f'{prefix}messdaten.bin': rng.randbytes(file_size)
+    }
+    if nested:
+        files['__MACOSX/._main.py'] = b'\0' * 256
+    return files
+
+
+def write_archive(path, archive_format, files):
+    if archive_format == "zip":
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, data in files.items():
+                archive.writestr(name, data)
+    elif archive_format == "tar.gz":
+        with tarfile.open(path, 'w:gz') as archive:
+            for name, data in files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+    elif archive_format == "7z":
+        from py7zr import SevenZipFile
+        with SevenZipFile(path, 'w') as archive:
+            for name, data in files.items():
+                archive.writestr(data, name)
+    else:
+        raise ValueError(f"Unknown archive format '{archive_format}' (synthetic.py: write_archive)")
+
+
+def generate_submissions(lecture, raw_folder, exercise_number, number_of_groups, file_size=64 * 1024, seed=0):
+    rng = random.Random(seed)
+    try:
+        import py7zr
+        has_7z = True
+    except ImportError:
+        has_7z = False
+
+    my_students = [student for tutorial_id in lecture.my_tutorial_ids for student in lecture.students[tutorial_id]]
+    os.makedirs(raw_folder, exist_ok=True)
+    submissions = list()
+    position = 0
+    for _ in range(number_of_groups):
+        group_size = rng.choice((2, 2, 3))
+        if position + group_size > len(my_students):
+            position = 0
+        students = my_students[position:position + group_size]
+        position += group_size
+
+        naming, file_name = submission_file_name(rng, students, exercise_number)
+        variant = _weighted_choice(rng, ARCHIVE_VARIANTS)
+        if variant == "7z" and not has_7z:
+            variant = "zip"
+        archive_format, extension = {"mislabelled": ("tar.gz", "zip")}.get(variant, (variant, variant))
+
+        path = os.path.join(raw_folder, f'{file_name}.{extension}')
+        if os.path.exists(path):
+            path = os.path.join(raw_folder, f'{file_name}_{len(submissions)}.{extension}')
+        nested = rng.random() < 0.3
+        write_archive(path, archive_format, submission_files(rng, exercise_number, file_size, nested))
+        submissions.append(SimpleNamespace(path=path, students=students, naming=naming, archive=variant,
+                                           nested=nested))
+
+    return submissions
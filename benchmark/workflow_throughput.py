@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from json import load as j_load
+from os.path import join as p_join
+from smtplib import SMTP
+from types import SimpleNamespace
+
+from assistance.command.workflow import WorkflowUnzipCommand, WorkflowPrepareCommand, WorkflowConsolidate, \
+    WorkflowSendMail
+from benchmark.data_layer import git_commit
+from benchmark.smtp_sink import SMTPSink
+from benchmark.synthetic import generate_lecture, generate_submissions
+from data.storage import InteractiveDataStorage, PhysicalDataStorage
+from mail.delivery import delivery_settings
+from mail.mail_out import EMailSender
+from util.config import load_config
+from util.console import RecordingPrinter
+
+EXERCISE_NUMBER = 3
+STUDENTS_PER_TUTORIAL = 25
+
+
+class AutoAnswerPrinter(RecordingPrinter):
+    def __init__(self):
+        super().__init__()
+        self.prompts = 0
+
+    def input(self, message=""):
+        self.prompts += 1
+        return 'cancel'
+
+
+def make_storage(root, lecture):
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    storage = object.__new__(InteractiveDataStorage)
+    storage.config = load_config(p_join(repository, "config.json.template"))
+    storage.config.storage.root = root
+    storage.config.storage.staging = "copy"
+    storage.account_data = SimpleNamespace(muesli=SimpleNamespace(email="tutor@example.org"))
+    storage.physical_storage = PhysicalDataStorage(storage.config.storage)
+    storage.my_name, storage.my_name_alias = "Tina Tutor", "Tina"
+    storage.my_tutorial_ids = lecture.my_tutorial_ids
+    storage.other_tutorial_ids = lecture.other_tutorial_ids
+    storage.tutorials = lecture.tutorials
+    storage.students = lecture.students
+    storage.imported_students, storage.exported_students = list(), list()
+    storage._group_registry = None
+    storage._presented_score = dict()
+    return storage
+
+
+def write_exercise_meta(storage, number_of_tasks=4):
+    feedback = storage.muesli_data.feedback
+    data = {
+        "title": f'{feedback.exercise_title}{EXERCISE_NUMBER}',
+        "exercise_id": "benchmark",
+        "max_credits": [[f'{feedback.task_prefix}{i + 1}', 5.0] for i in range(number_of_tasks)]
+    }
+    os.makedirs(storage.get_exercise_folder(EXERCISE_NUMBER), exist_ok=True)
+    with open(storage._get_exercise_meta_path(EXERCISE_NUMBER), 'w', encoding='utf-8') as fp:
+        json.dump(data, fp)
+
+
+def tree_size(path):
+    total = 0
+    for directory, _, files in os.walk(path):
+        total += sum(os.path.getsize(p_join(directory, file)) for file in files)
+    return total
+
+
+def cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def measure(name, run, input_folder, output_folder):
+    bytes_read = tree_size(input_folder)
+    wall, cpu = time.perf_counter(), cpu_seconds()
+    items = run()
+    wall, cpu = time.perf_counter() - wall, cpu_seconds() - cpu
+    bytes_written = tree_size(output_folder) if output_folder is not None else 0
+
+    print(f"{name:<22}{items:>7d}{wall:>10.3f}{cpu:>10.3f}"
+          f"{bytes_read / 2 ** 20:>12.1f}{bytes_written / 2 ** 20:>12.1f}{items / wall if wall > 0 else 0.0:>10.1f}")
+    return {"stage": name, "items": items, "wall_seconds": wall, "cpu_seconds": cpu, "bytes_read": bytes_read,
+            "bytes_written": bytes_written}
+
+
+def feedback_jobs(storage):
+    finished_folder = storage.get_finished_folder(EXERCISE_NUMBER)
+    feedback_name = f"{storage.muesli_data.feedback.file_name}.txt"
+    students_by_id = storage.student_index()
+    jobs = list()
+    for directory in sorted(os.listdir(finished_folder)):
+        with open(p_join(finished_folder, directory, "meta.json"), 'r', encoding='utf-8') as fp:
+            meta = j_load(fp)
+        students = [students_by_id[muesli_id] for muesli_id in meta["muesli_ids"] if muesli_id in students_by_id]
+        if len(students) > 0:
+            jobs.append(SimpleNamespace(students=students, path=p_join(finished_folder, directory, feedback_name)))
+    return jobs
+
+
+def send_with_email_sender(storage, account):
+    jobs = feedback_jobs(storage)
+    sender = EMailSender(account, storage.my_name)
+    # the sink speaks plain SMTP, so the connection is opened without the STARTTLS of EMailSender.__enter__
+    sender._smtp_server = SMTP(account.mail_server.outgoing.host, account.mail_server.outgoing.port)
+    sender._smtp_server.login(account.user, account.password)
+    for job in jobs:
+        sender.send_feedback(job.students, "Feedback im Anhang.", job.path, storage.muesli_data.exercise_prefix,
+                             EXERCISE_NUMBER)
+    sender.__exit__(None, None, None)
+    return len(jobs)
+
+
+def run_workflow(root, number_of_groups, file_size, latency, connections):
+    my_tutorials = -(-number_of_groups * 3 // STUDENTS_PER_TUTORIAL)
+    lecture = generate_lecture(STUDENTS_PER_TUTORIAL * (my_tutorials + 4), STUDENTS_PER_TUTORIAL, my_tutorials)
+    storage = make_storage(root, lecture)
+    write_exercise_meta(storage)
+
+    raw_folder = storage.get_raw_folder(EXERCISE_NUMBER)
+    submissions = generate_submissions(lecture, raw_folder, EXERCISE_NUMBER, number_of_groups, file_size)
+    variants = dict()
+    for submission in submissions:
+        for key in (f"naming:{submission.naming}", f"archive:{submission.archive}"):
+            variants[key] = variants.get(key, 0) + 1
+
+    printer = AutoAnswerPrinter()
+    preprocessed_folder = storage.get_preprocessed_folder(EXERCISE_NUMBER)
+    working_folder = storage.get_working_folder(EXERCISE_NUMBER)
+    finished_folder = storage.get_finished_folder(EXERCISE_NUMBER)
+
+    def unzip():
+        WorkflowUnzipCommand(printer, storage)(str(EXERCISE_NUMBER))
+        return len(os.listdir(preprocessed_folder))
+
+    def prepare():
+        WorkflowPrepareCommand(printer, storage, None)(str(EXERCISE_NUMBER))
+        return len(os.listdir(working_folder))
+
+    def consolidate():
+        WorkflowConsolidate(printer, storage)(str(EXERCISE_NUMBER))
+        return len(os.listdir(finished_folder))
+
+    print(f"{'stage':<22}{'items':>7}{'wall [s]':>10}{'cpu [s]':>10}{'read [MiB]':>12}{'write [MiB]':>12}"
+          f"{'items/s':>10}")
+    results = [
+        measure("workflow.unzip", unzip, raw_folder, preprocessed_folder),
+        measure("workflow.prepare", prepare, preprocessed_folder, working_folder),
+        measure("workflow.consolidate", consolidate, working_folder, finished_folder)
+    ]
+
+    with SMTPSink(latency=latency) as sink:
+        results.append(measure("EMailSender", lambda: send_with_email_sender(storage, sink.account()),
+                               finished_folder, None))
+
+    def send_feedback():
+        WorkflowSendMail(printer, storage)(str(EXERCISE_NUMBER))
+        return sink.number_of_messages
+
+    outbox_folder = p_join(storage.get_exercise_folder(EXERCISE_NUMBER), "outbox")
+    with SMTPSink(latency=latency) as sink:
+        storage.account_data.mail = sink.account()
+        storage.config.mail = SimpleNamespace(**dict(vars(storage.config.mail), connections=connections,
+                                                     starttls=False, retry_delay=0.1))
+        results.append(measure("workflow.send_feedback", send_feedback, finished_folder, outbox_folder))
+
+    return results, variants, printer.prompts
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Measures the weekly correction workflow on a generated corpus.")
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--file-size', type=int, default=256, help="size of the binary file per submission [KiB]")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="delay of every SMTP reply of the sink")
+    parser.add_argument('--connections', type=int, default=delivery_settings().connections)
+    parser.add_argument('--output', help="JSON file for the results (default: workflow_<commit>.json)")
+    parser.add_argument('--compare', help="JSON file of a previous run to compare with")
+    arguments = parser.parse_args(arguments)
+
+    commit = git_commit()
+    with tempfile.TemporaryDirectory() as root:
+        results, variants, prompts = run_workflow(root, arguments.groups, arguments.file_size * 1024,
+                                                  arguments.latency_ms / 1000, arguments.connections)
+
+    print()
+    print("Corpus: " + ", ".join(f"{count} {key}" for key, count in sorted(variants.items())))
+    print(f"Answered {prompts} interactive prompts with 'cancel'.")
+
+    output = arguments.output or f"workflow_{commit or 'unknown'}.json"
+    with open(output, 'w', encoding='utf-8') as fp:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "parameters": vars(arguments),
+            "corpus": variants,
+            "prompts": prompts,
+            "results": results
+        }, fp, indent=4)
+    print(f"Results written to {output}")
+
+    if arguments.compare:
+        with open(arguments.compare, 'r', encoding='utf-8') as fp:
+            baseline = json.load(fp)
+        previous = {entry["stage"]: entry for entry in baseline["results"]}
+        print()
+        print(f"Compared to {arguments.compare} (commit {baseline.get('commit')}):")
+        for entry in results:
+            old = previous.get(entry["stage"])
+            if old is not None and old["wall_seconds"] > 0:
+                print(f"{entry['stage']:<22}{entry['wall_seconds'] / old['wall_seconds']:>8.2f}x wall"
+                      f"{entry['cpu_seconds'] / old['cpu_seconds'] if old['cpu_seconds'] > 0 else 0.0:>8.2f}x cpu")
+
+
+if __name__ == '__main__':
+    main()
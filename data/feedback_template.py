@@ -0,0 +1,49 @@
+import hashlib
+from json import dumps as j_dumps
+
+
+class FeedbackTemplate:
+    def __init__(self, title, max_credits, show_problems, default_answer):
+        self._show_problems = show_problems
+
+        header = list()
+        header.append('┌' + '─' * 98 + '┐')
+        header.append(f'│{title:^98}│')
+        header.append('└' + '─' * 98 + '┘')
+        self._header = ''.join(line + '\n' for line in header)
+
+        tasks = list()
+        for task_name, max_credit in max_credits:
+            max_credit = f'[Max: {max_credit}]'
+
+            tasks.append(f'{task_name:<100}'[:-len(max_credit)] + max_credit)
+            tasks.append('─' * 100)
+            tasks.append(default_answer)
+            tasks.append("")
+            tasks.append("")
+        self._tasks = ''.join(line + '\n' for line in tasks)
+
+        digest = hashlib.sha256()
+        digest.update(j_dumps([self._header, self._tasks, show_problems]).encode('utf-8'))
+        self.fingerprint = digest.hexdigest()
+
+    def input_hash(self, original_name, problems):
+        digest = hashlib.sha256()
+        digest.update(self.fingerprint.encode('ascii'))
+        digest.update(j_dumps([original_name, problems]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def render(self, original_name, problems):
+        parts = [self._header, f'Abgegeben als: {original_name}\n', '\n']
+
+        if self._show_problems:
+            if len(problems) > 0:
+                parts.append("Mit der Namensgebung der Datei gab es Probleme:\n")
+                parts.extend(f"  ■ {problem}\n" for problem in problems)
+                parts.append("\n")
+            else:
+                parts.append("Die Benennung der Abgabedatei war korrekt.\n")
+                parts.append("\n")
+
+        parts.append(self._tasks)
+        return ''.join(parts)
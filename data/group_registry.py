@@ -0,0 +1,78 @@
+import re
+from difflib import get_close_matches
+
+import unicodedata
+
+
+def normalize_variant(raw_name):
+    name = raw_name.lower()
+    name = re.sub(r'[_-]ex\d+$', '', name)
+    name = name.replace('ä', 'ae').replace('ö', 'oe').replace('ü', 'ue').replace('ß', 'ss')
+    name = unicodedata.normalize('NFD', name).encode('ascii', 'ignore').decode('utf-8')
+    return re.sub(r'[^a-z0-9]', '', name)
+
+
+class GroupRegistry:
+    def __init__(self, groups=None, fuzzy_cutoff=0.85):
+        self._groups = list()
+        self._variants = dict()
+        self._fuzzy_cutoff = fuzzy_cutoff
+
+        for group in groups or list():
+            self._add(group)
+
+    @property
+    def groups(self):
+        return list(self._groups)
+
+    def _add(self, group):
+        group["muesli_ids"] = sorted(group["muesli_ids"])
+        self._groups.append(group)
+        for variant in group["variants"]:
+            self._variants[normalize_variant(variant)] = group
+
+    def _remove(self, group):
+        self._groups.remove(group)
+        self._variants = {key: value for key, value in self._variants.items() if value is not group}
+
+    def resolve(self, raw_name):
+        key = normalize_variant(raw_name)
+        if len(key) == 0:
+            return None, False
+
+        if key in self._variants:
+            return self._variants[key], True
+
+        matches = get_close_matches(key, self._variants.keys(), n=1, cutoff=self._fuzzy_cutoff)
+        if len(matches) > 0:
+            return self._variants[matches[0]], False
+
+        return None, False
+
+    def record(self, raw_name, muesli_ids, exercise_number):
+        muesli_ids = sorted(set(muesli_ids))
+        if len(muesli_ids) == 0:
+            return list()
+
+        changes = list()
+        same_group = None
+        for group in list(self._groups):
+            if group["muesli_ids"] == muesli_ids:
+                same_group = group
+            elif len(set(group["muesli_ids"]) & set(muesli_ids)) > 0:
+                changes.append(f"Group changed since exercise {group['last_exercise']}: "
+                               f"{group['muesli_ids']} -> {muesli_ids}")
+                self._remove(group)
+
+        if same_group is None:
+            self._add({"muesli_ids": muesli_ids, "variants": [raw_name], "last_exercise": exercise_number})
+        else:
+            if raw_name not in same_group["variants"]:
+                same_group["variants"].append(raw_name)
+                self._variants[normalize_variant(raw_name)] = same_group
+            same_group["last_exercise"] = max(same_group["last_exercise"], exercise_number)
+
+        return changes
+
+    def to_json(self):
+        return [dict(group) for group in self._groups]
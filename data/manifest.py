@@ -0,0 +1,82 @@
+import hashlib
+import os
+from datetime import datetime
+from json import load as j_load, dump as j_dump
+
+STAGES = ("unzip", "prepare", "consolidate", "upload", "send_feedback")
+
+
+def hash_file(path, chunk_size=2 ** 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(hash_file(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def fingerprint_tree(path):
+    digest = hashlib.sha256()
+    for root, directories, files in os.walk(path):
+        directories.sort()
+        for file in sorted(files):
+            file_path = os.path.join(root, file)
+            status = os.stat(file_path)
+            relative_path = os.path.relpath(file_path, path).replace('\\', '/')
+            digest.update(f'{relative_path}\0{status.st_size}\0{status.st_mtime_ns}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class StageManifest:
+    def __init__(self, path):
+        self._path = path
+        self._stages = {stage: dict() for stage in STAGES}
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as fp:
+                for stage, records in j_load(fp).get("stages", dict()).items():
+                    self._stages[stage] = records
+
+    def get(self, stage, key):
+        return self._stages[stage].get(key)
+
+    def records(self, stage):
+        return dict(self._stages[stage])
+
+    def is_done(self, stage, key, content_hash):
+        record = self.get(stage, key)
+        return record is not None and record["done"] and record["hash"] == content_hash
+
+    def mark_done(self, stage, key, content_hash, **details):
+        self._set(stage, key, content_hash, True, details)
+
+    def mark_failed(self, stage, key, content_hash, error, **details):
+        details["error"] = error
+        self._set(stage, key, content_hash, False, details)
+
+    def _set(self, stage, key, content_hash, done, details):
+        record = {
+            "hash": content_hash,
+            "done": done,
+            "time": datetime.now().isoformat(timespec='seconds')
+        }
+        record.update(details)
+        self._stages[stage][key] = record
+
+    def directories(self):
+        directories = {record["directory"] for record in self._stages["unzip"].values() if "directory" in record}
+        for stage in STAGES[1:]:
+            directories.update(self._stages[stage].keys())
+        return sorted(directories)
+
+    def save(self):
+        temporary_path = self._path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as fp:
+            j_dump({"stages": self._stages}, fp, indent=4)
+        os.replace(temporary_path, self._path)
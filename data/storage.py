@@ -1,5 +1,6 @@
 import os
 import os.path
+import pickle
 from collections import defaultdict
 from json import load as j_load, dump as j_dump
 from os.path import join as p_join
@@ -9,10 +10,19 @@ from types import SimpleNamespace
 import unicodedata
 
 from data.data import Student, Tutorial
+from data.feedback_template import FeedbackTemplate
+from data.group_registry import GroupRegistry
+from data.manifest import StageManifest, hash_file
 from data.student_matching import match_students, print_result_table
+from mail.outbox import Outbox
 from moodle.api import MoodleSession
 from muesli.api import MuesliSession
 from util.config import load_config
+from util.timing import span
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_ATTRIBUTES = ("my_name", "my_name_alias", "my_tutorial_ids", "other_tutorial_ids", "tutorials", "students",
+                       "_presented_score", "imported_students", "exported_students")
 
 
 def ensure_folder_exists(path):
@@ -118,6 +128,23 @@ class PhysicalDataStorage:
 
         return result
 
+    def save_groups(self, groups):
+        directory = ensure_folder_exists(p_join(self._meta_path, "students"))
+        path = p_join(directory, "groups.json")
+        with open(path, 'w', encoding='utf-8') as fp:
+            j_dump(groups, fp, indent=4)
+
+    def load_groups(self):
+        directory = ensure_folder_exists(p_join(self._meta_path, "students"))
+        path = p_join(directory, "groups.json")
+        result = list()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as fp:
+                result = j_load(fp)
+
+        return result
+
     def save_presented_scores(self, presented_score):
         directory = ensure_folder_exists(p_join(self._meta_path, "students"))
         path = p_join(directory, "presented_information.json")
@@ -142,6 +169,100 @@ class PhysicalDataStorage:
 
         return result
 
+    def save_session_state(self, name, state):
+        directory = ensure_folder_exists(p_join(self._meta_path, "sessions"))
+        path = p_join(directory, f'{name}.json')
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as fp:
+            j_dump(state, fp, indent=4)
+        os.chmod(path, 0o600)
+
+    def load_session_state(self, name):
+        path = p_join(self._meta_path, "sessions", f'{name}.json')
+        result = None, "Missing"
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as fp:
+                result = j_load(fp), "Loaded"
+
+        return result
+
+    def remove_session_state(self, name):
+        path = p_join(self._meta_path, "sessions", f'{name}.json')
+        if os.path.exists(path):
+            os.remove(path)
+
+    def get_memory_folder(self):
+        return p_join(self._meta_path, "memory")
+
+    def save_snapshot(self, state, tutorial_ids, with_presented_scores, config_path):
+        required = ['01_my_name.json', '02_my_ids.json', '02_other_ids.json', '03_tutorials.json', config_path]
+        required += [p_join("students", f'students_{tutorial_id}.json') for tutorial_id in tutorial_ids]
+        if with_presented_scores:
+            required.append(p_join("students", "presented_information.json"))
+        optional = [p_join("students", "imported_students.json"), p_join("students", "exported_students.json")]
+
+        sources = {name: self._source_signature(name) for name in required + optional}
+        if any(sources[name] is None for name in required):
+            return False
+
+        path = p_join(self._meta_path, 'snapshot.pickle')
+        with open(path + '.tmp', 'wb') as fp:
+            pickle.dump({"version": SNAPSHOT_VERSION, "sources": sources, "state": state}, fp,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        return True
+
+    def load_snapshot(self):
+        path = p_join(self._meta_path, 'snapshot.pickle')
+        result = None, "Missing"
+
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as fp:
+                    snapshot = pickle.loads(fp.read())
+            except Exception:
+                return None, "Corrupt"
+
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                result = None, "Outdated"
+            elif any(self._source_signature(name) != signature for name, signature in snapshot["sources"].items()):
+                result = None, "Outdated"
+            else:
+                result = snapshot["state"], "Loaded"
+
+        return result
+
+    def _source_signature(self, name):
+        try:
+            stat = os.stat(p_join(self._meta_path, name))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+
+class RosterSnapshot:
+    def __init__(self, storage):
+        self.my_name = storage.my_name
+        self.my_name_alias = storage.my_name_alias
+        self.muesli_data = storage.muesli_data
+        self.muesli_account = SimpleNamespace(email=storage.muesli_account.email)
+        self._all_students = storage.all_students
+        self._my_students = storage.my_students
+        self._other_students = storage.other_students
+
+    def get_students_by_name(self, name, mode='all'):
+        if mode == 'all':
+            all_students = self._all_students
+        elif mode == 'my':
+            all_students = self._my_students
+        elif mode == 'other':
+            all_students = self._other_students
+        else:
+            raise ValueError(f"Unknown mode '{mode}' in get_students_by_name (storage.py: RosterSnapshot)")
+
+        return list(match_student(name, all_students))
+
 
 class InteractiveDataStorage:
     __instance = None
@@ -158,6 +279,7 @@ class InteractiveDataStorage:
         InteractiveDataStorage.__instance.exported_students = list()
         InteractiveDataStorage.__instance.imported_students = list()
         InteractiveDataStorage.__instance.scores = dict()
+        InteractiveDataStorage.__instance._group_registry = None
         InteractiveDataStorage.__instance.account_data = load_config("account_data.json")
         InteractiveDataStorage.__instance.config = load_config("config.json")
         storage_config = InteractiveDataStorage.__instance.config.storage
@@ -166,16 +288,39 @@ class InteractiveDataStorage:
         return InteractiveDataStorage.__instance
 
     def init_data(self, muesli, moodle):
-        self._init_my_name(muesli)
-        self._init_tutorial_ids(muesli, mode='my')
-        self._init_tutorial_ids(muesli, mode='other')
-        self._init_tutorials(muesli)
-        self._init_students(muesli)
-        self._init_moodle_attributes(moodle)
-        self._init_presented_scores(muesli)
-
-        self.__instance.imported_students = self.physical_storage.load_exchanged_students('imported')
-        self.__instance.exported_students = self.physical_storage.load_exchanged_students('exported')
+        with span("storage.load_snapshot"):
+            print("Load snapshot ...", end='')
+            state, status = self.physical_storage.load_snapshot()
+            print(f'[{status}]')
+        if state is not None:
+            for name, value in state.items():
+                setattr(self, name, value)
+            return
+
+        with span("storage.init_my_name"):
+            self._init_my_name(muesli)
+        with span("storage.init_tutorial_ids"):
+            self._init_tutorial_ids(muesli, mode='my')
+            self._init_tutorial_ids(muesli, mode='other')
+        with span("storage.init_tutorials"):
+            self._init_tutorials(muesli)
+        with span("storage.init_students"):
+            self._init_students(muesli)
+        with span("storage.init_moodle_attributes"):
+            self._init_moodle_attributes(moodle)
+        with span("storage.init_presented_scores"):
+            self._init_presented_scores(muesli)
+
+        with span("storage.init_exchanged_students"):
+            self.__instance.imported_students = self.physical_storage.load_exchanged_students('imported')
+            self.__instance.exported_students = self.physical_storage.load_exchanged_students('exported')
+        self._save_snapshot()
+
+    def _save_snapshot(self):
+        state = {name: getattr(self, name) for name in SNAPSHOT_ATTRIBUTES if hasattr(self, name)}
+        self.physical_storage.save_snapshot(state, self.my_tutorial_ids + self.other_tutorial_ids,
+                                            self.muesli_data.presentation.supports_presentations,
+                                            os.path.abspath("config.json"))
 
     def _init_my_name(self, muesli: MuesliSession):
         print(f"Load my name ...", end='')
@@ -349,7 +494,11 @@ class InteractiveDataStorage:
     def _load_students_from_moodle(self, moodle: MoodleSession):
         print("Not all students are matched with their Moodle version.")
         print("Gathering information from Moodle...", end='')
-        moodle_students = moodle.get_students(self.moodle_data.course_id, self.moodle_data.student_role)
+        moodle_students = moodle.get_students(
+            self.moodle_data.course_id,
+            self.moodle_data.student_role,
+            page_size=self.moodle_page_size
+        )
         print("[Ok]")
 
         return moodle_students
@@ -397,6 +546,38 @@ class InteractiveDataStorage:
     def moodle_data(self):
         return self.config.moodle
 
+    @property
+    def staging_mode(self):
+        return getattr(self.storage_config, 'staging', 'auto')
+
+    @property
+    def extraction_config(self):
+        return getattr(self.config, 'extraction', None)
+
+    @property
+    def workflow_config(self):
+        return getattr(self.config, 'workflow', None)
+
+    @property
+    def tracing_config(self):
+        return getattr(self.config, 'tracing', None)
+
+    @property
+    def memory_config(self):
+        return getattr(self.config, 'memory', None)
+
+    @property
+    def console_config(self):
+        return getattr(self.config, 'console', None)
+
+    @property
+    def mail_delivery_config(self):
+        return getattr(self.config, 'mail', None)
+
+    @property
+    def moodle_page_size(self):
+        return getattr(self.moodle_data, 'page_size', None)
+
     @property
     def all_students(self):
         return [student for k, students in self.students.items() for student in students]
@@ -479,6 +660,9 @@ class InteractiveDataStorage:
 
         return result
 
+    def student_index(self):
+        return {student.muesli_student_id: student for student in self.all_students}
+
     def has_presented(self, student):
         return self._presented_score[student.tutorial_id][student.muesli_student_id]
 
@@ -486,17 +670,46 @@ class InteractiveDataStorage:
         self._presented_score[student.tutorial_id][student.muesli_student_id] = True
         self.physical_storage.save_presented_scores(self._presented_score)
 
+    def roster_snapshot(self):
+        return RosterSnapshot(self)
+
+    @property
+    def group_registry(self):
+        if self._group_registry is None:
+            self._group_registry = GroupRegistry(self.physical_storage.load_groups())
+        return self._group_registry
+
+    def save_group_registry(self):
+        if self._group_registry is not None:
+            self.physical_storage.save_groups(self._group_registry.to_json())
+
     def get_all_tutorials_of_tutor(self, tutor):
         return [tutorial for tutorial in self.tutorials.values() if tutorial.tutor == tutor]
 
     def download_submissions_of_my_students(self, moodle: MoodleSession, exercise_number, printer):
+        submissions, my_students = self.find_submissions_of_my_students(moodle, exercise_number, printer)
+
+        folder = ensure_folder_exists(self.get_raw_folder(exercise_number))
+        for submission in submissions:
+            try:
+                printer.inform(f"Downloading submission of {my_students[submission.moodle_student_id]} ... ", end='')
+                self.download_submission(moodle, submission, folder)
+                printer.confirm('[Ok]')
+            except Exception as e:
+                printer.error('[Err]')
+                printer.error(str(e))
+
+        self.save_submissions_meta(folder, submissions, printer)
+
+    def find_submissions_of_my_students(self, moodle: MoodleSession, exercise_number, printer):
         printer.inform('Connecting to Moodle and collecting data.')
         printer.inform('This may take a few seconds.')
         submissions = moodle.find_submissions(
             self.moodle_data.course_id,
             self.moodle_data.exercise_prefix,
             exercise_number,
-            printer
+            printer,
+            page_size=self.moodle_page_size
         )
         printer.inform(f"Found a total of {len(submissions)} for '{self.moodle_data.exercise_prefix}{exercise_number}'")
         my_students = self.my_students
@@ -504,25 +717,40 @@ class InteractiveDataStorage:
 
         submissions = [submission for submission in submissions if submission.moodle_student_id in my_students]
         printer.inform(f"Found {len(submissions)} submissions for me")
+        self._unique_file_names(submissions, printer)
 
-        folder = os.path.join(
-            self.storage_config.root,
-            self.storage_config.submission_root,
-            f'{self.storage_config.exercise_template}{exercise_number}',
-            self.storage_config.raw_folder
-        )
-        ensure_folder_exists(folder)
-        for submission in submissions:
-            with open(os.path.join(folder, submission.file_name), 'wb') as fp:
-                try:
-                    printer.inform(f"Downloading submission of {my_students[submission.moodle_student_id]} ... ",
-                                   end='')
-                    moodle.download(submission.url, fp)
-                    printer.confirm('[Ok]')
-                except Exception as e:
-                    printer.error('[Err]')
-                    printer.error(str(e))
+        return submissions, my_students
 
+    @staticmethod
+    def _unique_file_names(submissions, printer):
+        from util.archive import split_archive_name
+
+        # two students of a group often upload the same file, which must not end up in the same download path
+        used = set()
+        for submission in submissions:
+            file_name, extension = split_archive_name(submission.file_name)
+            unique_name, count = submission.file_name, 1
+            while unique_name.lower() in used:
+                count += 1
+                unique_name = f"{file_name} ({count}){extension}"
+            used.add(unique_name.lower())
+            if unique_name != submission.file_name:
+                printer.warning(f"'{submission.file_name}' was uploaded more than once, "
+                                f"saving it as '{unique_name}'.")
+                submission.file_name = unique_name
+
+    def download_submission(self, moodle: MoodleSession, submission, folder):
+        path = os.path.join(folder, submission.file_name)
+        try:
+            with open(path, 'wb') as fp:
+                moodle.download(submission.url, fp)
+        except BaseException:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path
+
+    def save_submissions_meta(self, folder, submissions, printer):
         with open(os.path.join(folder, "meta.json"), 'w') as fp:
             try:
                 printer.inform(f'Write meta data ... ', end='')
@@ -579,6 +807,13 @@ class InteractiveDataStorage:
         with open(path, 'w', encoding='utf-8') as fp:
             j_dump(data, fp)
 
+    def get_stage_manifest(self, exercise_number):
+        folder = ensure_folder_exists(self.get_exercise_folder(exercise_number))
+        return StageManifest(os.path.join(folder, "workflow_manifest.json"))
+
+    def get_outbox(self, exercise_number):
+        return Outbox(os.path.join(self.get_exercise_folder(exercise_number), "outbox"))
+
     def _get_exercise_meta_path(self, exercise_number):
         return os.path.join(self.get_exercise_folder(exercise_number), "exercise_meta.json")
 
@@ -586,7 +821,7 @@ class InteractiveDataStorage:
         path = self._get_exercise_meta_path(exercise_number)
         return os.path.exists(path)
 
-    def generate_feedback_template(self, exercise_number, target_path, printer):
+    def compile_feedback_template(self, exercise_number):
         path = self._get_exercise_meta_path(exercise_number)
         if not self.has_exercise_meta(exercise_number):
             raise FileExistsError("The exercise meta data was not created")
@@ -594,45 +829,33 @@ class InteractiveDataStorage:
         with open(path, 'r', encoding='utf-8') as fp:
             template_data = SimpleNamespace(**j_load(fp))
 
+        feedback = self.muesli_data.feedback
+        return FeedbackTemplate(template_data.title, template_data.max_credits, feedback.show_problems,
+                                feedback.default_answer)
+
+    def generate_feedback_template(self, template, target_path, printer, record=None):
         with open(os.path.join(target_path, "submission_meta.json"), 'r', encoding='utf-8') as fp:
             submission_data = SimpleNamespace(**j_load(fp))
 
-        lines = list()
-        lines.append('┌' + '─' * 98 + '┐')
-        lines.append(f'│{template_data.title:^98}│')
-        lines.append('└' + '─' * 98 + '┘')
-        lines.append(f'Abgegeben als: {submission_data.original_name}')
-        lines.append('')
-
-        if self.muesli_data.feedback.show_problems:
-            if len(submission_data.problems) > 0:
-                lines.append("Mit der Namensgebung der Datei gab es Probleme:")
-                for problem in submission_data.problems:
-                    lines.append("  ■ " + problem)
-                lines.append("")
-            else:
-                lines.append("Die Benennung der Abgabedatei war korrekt.")
-                lines.append("")
-
-        for task_name, max_credits in template_data.max_credits:
-            max_credits = f'[Max: {max_credits}]'
-
-            lines.append(f'{task_name:<100}'[:-len(max_credits)] + max_credits)
-            lines.append('─' * 100)
-            lines.append(self.muesli_data.feedback.default_answer)
-            lines.append("")
-            lines.append("")
-
+        input_hash = template.input_hash(submission_data.original_name, submission_data.problems)
         feedback_path = os.path.join(target_path, f'{self.muesli_data.feedback.file_name}.txt')
 
         if os.path.exists(feedback_path):
-            printer.warning(f"There is already a generated feedback file at {target_path}."
-                            f" Please remove it manually, if you want to recreate it.")
-
-        else:
-            with open(feedback_path, 'w', encoding='utf-8') as fp:
-                for line in lines:
-                    print(line, file=fp)
+            if record is None or "template_output" not in record:
+                printer.warning(f"There is already a generated feedback file at {target_path}."
+                                f" Please remove it manually, if you want to recreate it.")
+                return None
+            if record.get("template_input") == input_hash:
+                return None
+            if hash_file(feedback_path) != record["template_output"]:
+                printer.warning(f"The feedback file at {target_path} was edited after it was generated."
+                                f" It is kept - remove it manually, if you want to recreate it.")
+                return None
+
+        with open(feedback_path, 'w', encoding='utf-8') as fp:
+            fp.write(template.render(submission_data.original_name, submission_data.problems))
+
+        return {"template_input": input_hash, "template_output": hash_file(feedback_path)}
 
 
 def match_student(input_name, list_of_students):
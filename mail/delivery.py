@@ -0,0 +1,263 @@
+import os
+import queue
+import threading
+import time
+from smtplib import SMTP, SMTPAuthenticationError, SMTPResponseException, SMTPServerDisconnected, \
+    SMTPRecipientsRefused, SMTPSenderRefused, SMTPDataError
+from types import SimpleNamespace
+
+from _socket import gaierror
+
+DEFAULT_DELIVERY_CONFIG = {
+    "connections": 3,
+    "starttls": True,
+    "timeout": 60,
+    "max_messages_per_connection": 50,
+    "max_messages_per_minute": None,
+    "retries": 3,
+    "retry_delay": 2.0,
+    "compress_attachments": True
+}
+STREAM_CHUNK_SIZE = 2 ** 16
+
+
+def delivery_settings(config=None):
+    values = dict(DEFAULT_DELIVERY_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    return SimpleNamespace(**values)
+
+
+class RateLimiter:
+    def __init__(self, messages_per_minute):
+        self._interval = 60.0 / messages_per_minute if messages_per_minute else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self._interval == 0.0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPConnection:
+    def __init__(self, mail_account, settings):
+        self._host = mail_account.mail_server.outgoing.host
+        self._port = mail_account.mail_server.outgoing.port
+        self._user = mail_account.user
+        self._password = mail_account.password
+        self._settings = settings
+
+        self._smtp_server = None
+        self._sent = 0
+
+    def open(self):
+        try:
+            self._smtp_server = SMTP(self._host, self._port, timeout=self._settings.timeout)
+        except gaierror:
+            raise ConnectionRefusedError(f"Host '{self._host}:{self._port}' was not found.")
+
+        if self._settings.starttls:
+            self._smtp_server.starttls()
+
+        if self._user:
+            code, resp = self._smtp_server.login(self._user, self._password)
+            if code not in (235, 503):
+                raise ConnectionError("Could not log in to SMTP mail server. Please check account_data.json")
+
+        self._sent = 0
+
+    def send(self, mail):
+        if self._smtp_server is None or self._sent >= self._settings.max_messages_per_connection:
+            self.close()
+            self.open()
+
+        if getattr(mail, 'path', None) is not None:
+            refused = send_streamed(self._smtp_server, mail)
+        else:
+            refused = self._smtp_server.sendmail(from_addr=mail.from_addr, to_addrs=mail.to_addrs, msg=mail.data)
+        self._sent += 1
+        return refused
+
+    def close(self):
+        if self._smtp_server is None:
+            return
+
+        try:
+            self._smtp_server.quit()
+        except Exception:
+            self._smtp_server.close()
+        self._smtp_server = None
+
+
+def send_streamed(smtp_server, mail):
+    smtp_server.ehlo_or_helo_if_needed()
+    options = list()
+    if smtp_server.does_esmtp and smtp_server.has_extn('size'):
+        options.append(f'size={os.path.getsize(mail.path)}')
+
+    code, response = smtp_server.mail(mail.from_addr, options)
+    if code != 250:
+        _abort(smtp_server, code)
+        raise SMTPSenderRefused(code, response, mail.from_addr)
+
+    refused = dict()
+    for address in mail.to_addrs:
+        code, response = smtp_server.rcpt(address)
+        if code not in (250, 251):
+            refused[address] = (code, response)
+        if code == 421:
+            _abort(smtp_server, code)
+            raise SMTPRecipientsRefused(refused)
+    if len(refused) == len(mail.to_addrs):
+        _abort(smtp_server, 0)
+        raise SMTPRecipientsRefused(refused)
+
+    code, response = smtp_server.docmd('data')
+    if code != 354:
+        _abort(smtp_server, code)
+        raise SMTPDataError(code, response)
+
+    last_line = b'\r\n'
+    with open(mail.path, 'rb') as fp:
+        buffer, size = list(), 0
+        for line in fp:
+            if line.startswith(b'.'):
+                line = b'.' + line
+            buffer.append(line)
+            size += len(line)
+            last_line = line
+            if size >= STREAM_CHUNK_SIZE:
+                smtp_server.send(b''.join(buffer))
+                buffer, size = list(), 0
+
+        if not last_line.endswith(b'\r\n'):
+            buffer.append(b'\r\n')
+        buffer.append(b'.\r\n')
+        smtp_server.send(b''.join(buffer))
+
+    code, response = smtp_server.getreply()
+    if code != 250:
+        _abort(smtp_server, code)
+        raise SMTPDataError(code, response)
+
+    return refused
+
+
+def _abort(smtp_server, code):
+    if code == 421:
+        smtp_server.close()
+    else:
+        smtp_server.rset()
+
+
+def _is_transient(error):
+    if isinstance(error, SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return len(codes) > 0 and all(400 <= code < 500 for code in codes)
+    if isinstance(error, SMTPAuthenticationError):
+        return False
+    if isinstance(error, (SMTPResponseException, SMTPSenderRefused)):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (SMTPServerDisconnected, TimeoutError, ConnectionError, OSError)) \
+        and not isinstance(error, ConnectionRefusedError)
+
+
+class DeliveryEngine:
+    def __init__(self, mail_account, settings=None):
+        self._mail_account = mail_account
+        self._settings = settings or delivery_settings()
+        self._rate_limiter = RateLimiter(self._settings.max_messages_per_minute)
+        self._fatal_error = None
+        self._stopped = threading.Event()
+
+    def deliver(self, jobs):
+        jobs = list(jobs)
+        if len(jobs) == 0:
+            return
+
+        self._stopped = threading.Event()
+        number_of_connections = max(1, min(self._settings.connections, len(jobs)))
+        mails = queue.Queue(maxsize=2 * number_of_connections)
+        results = queue.Queue()
+
+        threads = [threading.Thread(target=self._build, args=(jobs, mails, results, number_of_connections),
+                                    daemon=True)]
+        threads += [threading.Thread(target=self._send_all, args=(mails, results), daemon=True)
+                    for _ in range(number_of_connections)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for _ in range(len(jobs)):
+                yield results.get()
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+
+    def _put(self, mails, item):
+        while not self._stopped.is_set():
+            try:
+                mails.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _build(self, jobs, mails, results, number_of_connections):
+        for job in jobs:
+            if self._stopped.is_set():
+                break
+            try:
+                self._put(mails, (job, job.build()))
+            except Exception as e:
+                results.put(_result(job, error=f'{e.__class__.__name__}: {e}'))
+
+        for _ in range(number_of_connections):
+            self._put(mails, None)
+
+    def _send_all(self, mails, results):
+        connection = SMTPConnection(self._mail_account, self._settings)
+        try:
+            while not self._stopped.is_set():
+                try:
+                    item = mails.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                results.put(self._send(connection, *item))
+        finally:
+            connection.close()
+
+    def _send(self, connection, job, mail):
+        attempts = 0
+        while True:
+            if self._fatal_error is not None:
+                return _result(job, error=self._fatal_error)
+
+            attempts += 1
+            self._rate_limiter.wait()
+            try:
+                refused = connection.send(mail)
+                return _result(job, success=True, attempts=attempts, refused=refused)
+            except Exception as e:
+                error = f'{e.__class__.__name__}: {e}'
+                connection.close()
+                if isinstance(e, (SMTPAuthenticationError, ConnectionRefusedError)):
+                    self._fatal_error = error
+                if not _is_transient(e) or attempts > self._settings.retries:
+                    return _result(job, error=error, attempts=attempts)
+
+                time.sleep(self._settings.retry_delay * attempts)
+
+
+def _result(job, success=False, error=None, attempts=0, refused=None):
+    return SimpleNamespace(job=job, success=success, error=error, attempts=attempts, refused=refused or dict())
@@ -1,13 +1,19 @@
-from email.encoders import encode_base64
+from base64 import encodebytes
 from email.header import Header
-from email.mime.base import MIMEBase
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from email.utils import encode_rfc2231
+from io import BytesIO
 from os.path import basename
 from smtplib import SMTP
+from tempfile import TemporaryFile
+from types import SimpleNamespace
+from uuid import uuid4
+from zipfile import ZipFile, ZIP_DEFLATED
 
 from _socket import gaierror
 
+# 57 input bytes are one base64 line of 76 characters
+BASE64_CHUNK_SIZE = 57 * 1024
+
 
 class EMailSender:
     def __init__(self, mail_account, my_name):
@@ -37,48 +43,92 @@ class EMailSender:
         return self
 
     def send_feedback(self, students, message, feedback_path, exercise_prefix, exercise_number, debug=False):
-        def normalize_mail(name, mail):
-            name = Header(f'{name}'.encode('utf-8'), 'utf-8').encode()
-            return f'{name} <{mail}>'
+        mail = build_feedback_mail(self._my_name, self._my_mail, students, message, [feedback_path], exercise_prefix,
+                                   exercise_number, debug=debug)
+        self._smtp_server.sendmail(
+            from_addr=mail.from_addr,
+            to_addrs=mail.to_addrs,
+            msg=mail.data
+        )
 
-        from_email = normalize_mail(self._my_name, self._my_mail)
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._smtp_server.quit()
 
-        to_emails = [normalize_mail(student.muesli_name, student.muesli_mail) for student in students]
 
-        email_message = MIMEMultipart()
-        email_message.add_header('From', from_email)
-        email_message.add_header('To', ', '.join(to_emails))
-        email_message.add_header('CC', from_email)
-        email_message.add_header('Subject', f'[IAD-20] Feedback zu {exercise_prefix} {exercise_number}')
+def normalize_mail(name, mail):
+    name = Header(f'{name}'.encode('utf-8'), 'utf-8').encode()
+    return f'{name} <{mail}>'
 
-        text_part = MIMEText(message, 'plain')
-        attachment = create_file_attachment(feedback_path)
 
-        email_message.attach(text_part)
-        email_message.attach(attachment)
+def build_feedback_mail(my_name, my_mail, students, message, attachment_paths, exercise_prefix, exercise_number,
+                        debug=False, message_id=None, archive_name=None):
+    buffer = BytesIO()
+    mail = write_feedback_mail(buffer, my_name, my_mail, students, message, attachment_paths, exercise_prefix,
+                               exercise_number, debug=debug, message_id=message_id, archive_name=archive_name)
+    mail.data = buffer.getvalue()
+    return mail
 
-        if debug:
-            to_emails = [from_email]
-        else:
-            to_emails = to_emails + [from_email]
 
-        self._smtp_server.sendmail(
-            from_addr=from_email,
-            to_addrs=to_emails,
-            msg=email_message.as_bytes()
-        )
+def write_feedback_mail(fp, my_name, my_mail, students, message, attachment_paths, exercise_prefix, exercise_number,
+                        debug=False, message_id=None, archive_name=None):
+    from_email = normalize_mail(my_name, my_mail)
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self._smtp_server.quit()
+    to_emails = [normalize_mail(student.muesli_name, student.muesli_mail) for student in students]
+
+    boundary = f'==============={uuid4().hex}=='
+    headers = [
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+        'MIME-Version: 1.0',
+        f'From: {from_email}',
+        'To: ' + ',\r\n '.join(to_emails),
+        f'CC: {from_email}',
+        'Subject: ' + Header(f'[IAD-20] Feedback zu {exercise_prefix} {exercise_number}', 'utf-8').encode()
+    ]
+    if message_id is not None:
+        headers.append(f'Message-ID: {message_id}')
+    _write_lines(fp, headers + [''])
+
+    _write_part(fp, boundary, ['Content-Type: text/plain; charset="utf-8"'], BytesIO(message.encode('utf-8')))
+
+    if archive_name is not None and len(attachment_paths) > 1:
+        with TemporaryFile() as archive:
+            with ZipFile(archive, 'w', compression=ZIP_DEFLATED) as zip_file:
+                for path in attachment_paths:
+                    zip_file.write(path, basename(path))
+            archive.seek(0)
+            _write_part(fp, boundary, _attachment_headers(archive_name), archive)
+    else:
+        for path in attachment_paths:
+            with open(path, 'rb') as source:
+                _write_part(fp, boundary, _attachment_headers(basename(path)), source)
+
+    _write_lines(fp, [f'--{boundary}--'])
+
+    if debug:
+        to_emails = [from_email]
+    else:
+        to_emails = to_emails + [from_email]
+
+    return SimpleNamespace(from_addr=from_email, to_addrs=to_emails)
+
+
+def _attachment_headers(file_name):
+    if file_name.isascii():
+        disposition = f'attachment; filename="{file_name}"'
+    else:
+        disposition = f"attachment; filename*={encode_rfc2231(file_name, 'utf-8')}"
+
+    return [
+        'Content-Type: application/octet-stream',
+        f'Content-Disposition: {disposition}'
+    ]
 
 
-def create_file_attachment(feedback_path):
-    file_name = basename(feedback_path)
+def _write_lines(fp, lines):
+    fp.write(''.join(line + '\r\n' for line in lines).encode('utf-8'))
 
-    attachment = MIMEBase("application", "octet-stream")
-    with open(feedback_path, 'rb') as fp:
-        attachment.set_payload(fp.read())
-    encode_base64(attachment)
-    attachment.add_header("Content-Disposition", f"attachment; filename={file_name}")
 
-    return attachment
+def _write_part(fp, boundary, headers, source):
+    _write_lines(fp, [f'--{boundary}'] + headers + ['MIME-Version: 1.0', 'Content-Transfer-Encoding: base64', ''])
+    for chunk in iter(lambda: source.read(BASE64_CHUNK_SIZE), b''):
+        fp.write(encodebytes(chunk).replace(b'\n', b'\r\n'))
@@ -0,0 +1,97 @@
+import os
+import threading
+from datetime import datetime
+from json import load as j_load, dump as j_dump
+from types import SimpleNamespace
+
+QUEUED, SENT, FAILED = "queued", "sent", "failed"
+
+
+class Outbox:
+    def __init__(self, path):
+        self._path = path
+        self._state_path = os.path.join(path, "outbox.json")
+        self._lock = threading.Lock()
+        self._entries = dict()
+
+        if os.path.exists(self._state_path):
+            with open(self._state_path, 'r', encoding='utf-8') as fp:
+                self._entries = j_load(fp)
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def is_sent(self, key, content_hash):
+        entry = self.get(key)
+        return entry is not None and entry["state"] == SENT and entry["hash"] == content_hash
+
+    def spool(self, key, content_hash, write_message):
+        file_name = f"{content_hash}.eml"
+        message_path = os.path.join(self._path, file_name)
+        os.makedirs(self._path, exist_ok=True)
+
+        temporary_path = message_path + '.tmp'
+        with open(temporary_path, 'wb') as fp:
+            envelope = write_message(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary_path, message_path)
+
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = {
+                "hash": content_hash,
+                "file": file_name,
+                "from_addr": envelope.from_addr,
+                "to_addrs": envelope.to_addrs,
+                "state": QUEUED,
+                "attempts": 0,
+                "time": _now()
+            }
+            self._save()
+
+        if previous is not None and previous["file"] != file_name:
+            self._remove_message(previous["file"])
+
+        return self.load(key)
+
+    def load(self, key):
+        entry = self.get(key)
+        return SimpleNamespace(from_addr=entry["from_addr"], to_addrs=entry["to_addrs"],
+                               path=os.path.join(self._path, entry["file"]))
+
+    def mark_sent(self, key, attempts):
+        self._update(key, state=SENT, attempts=attempts, error=None)
+
+    def mark_failed(self, key, attempts, error):
+        self._update(key, state=FAILED, attempts=attempts, error=error)
+
+    def _update(self, key, **values):
+        with self._lock:
+            entry = self._entries[key]
+            values["attempts"] = entry["attempts"] + values["attempts"]
+            entry.update(values, time=_now())
+            self._save()
+
+    def _remove_message(self, file_name):
+        with self._lock:
+            in_use = any(entry["file"] == file_name for entry in self._entries.values())
+        if not in_use:
+            try:
+                os.remove(os.path.join(self._path, file_name))
+            except FileNotFoundError:
+                pass
+
+    def _save(self):
+        os.makedirs(self._path, exist_ok=True)
+        temporary_path = self._state_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as fp:
+            j_dump(self._entries, fp, indent=4)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary_path, self._state_path)
+
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
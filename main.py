@@ -1,8 +1,19 @@
+import argparse
+
 from assistance.smart_assistant import SmartAssistant
+from util.console import OUTPUT_MODES
 
 
 def main():
-    assistant = SmartAssistant()
+    parser = argparse.ArgumentParser(description="Assists tutors with MÜSLI and Moodle.")
+    parser.add_argument('--output', choices=OUTPUT_MODES,
+                        help="'quiet' only shows warnings and errors, 'json' writes one JSON object per line "
+                             "(default: the 'console' section of config.json)")
+    parser.add_argument('--no-pager', dest='pager', action='store_false', default=None,
+                        help="never show long output in a pager")
+    arguments = parser.parse_args()
+
+    assistant = SmartAssistant(arguments.output, arguments.pager)
     assistant.hello()
     while assistant.ready:
         assistant.execute_cycle()
@@ -1,8 +1,11 @@
-import re
-from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 
-from bs4 import BeautifulSoup
-from requests import Session
+from moodle.table_parser import iter_table_rows, iter_response_text, find_hidden_inputs, has_classes, first_table, \
+    participant_from_row, submission_from_row
+from util.http import new_session, parse_html
+from util.session import cookies_to_json, restore_cookies
+
+LOGIN_URL = "https://moodle.uni-heidelberg.de/login/index.php"
 
 
 class MoodleSession:
@@ -40,24 +43,31 @@ class MoodleSession:
         def contains_login_token(elem):
             return elem["type"] == "hidden" and elem["name"] == "logintoken"
 
-        self._session = Session()
-        login_url = "https://moodle.uni-heidelberg.de/login/index.php"
-        website = self._session.get(url=login_url)
-        soup = BeautifulSoup(website.content, "html.parser")
+        self._session = new_session()
+        website = self._session.get(url=LOGIN_URL)
+        soup = parse_html(website.content)
         login_token = [inp for inp in soup.find_all('input') if contains_login_token(inp)][0]["value"]
 
-        r = self._session.post(login_url, data={
+        r = self._session.post(LOGIN_URL, data={
             "anchor": "",
             "username": self._account.name,
             "password": self._account.password,
             "logintoken": login_token
         })
-        soup = BeautifulSoup(r.content, "html.parser")
+        soup = parse_html(r.content)
         error_element = soup.find('p', attrs={'class': 'a', 'id': 'loginerrormessage'})
         if error_element is not None:
             raise ConnectionRefusedError('Wrong username or password.')
         self._logout_url = soup.find_all("a", attrs={"role": "menuitem", "data-title": "logout,moodle"})[0]["href"]
 
+    def export_state(self):
+        return {"cookies": cookies_to_json(self._session.cookies), "logout_url": self._logout_url}
+
+    def restore_state(self, state):
+        self._session = new_session()
+        restore_cookies(self._session.cookies, state["cookies"])
+        self._logout_url = state["logout_url"]
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.logout()
 
@@ -69,30 +79,35 @@ class MoodleSession:
 
     def get_course_page(self, course_id):
         course_url = f"https://moodle.uni-heidelberg.de/course/view.php?id={course_id}"
-        response = self._session.get(course_url)
-        return BeautifulSoup(response.content, "html.parser")
-
-    def get_students(self, course_id, student_role):
-        url = f'https://moodle.uni-heidelberg.de/user/index.php?id={course_id}&perpage=5000'
-        response = self._session.get(url)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        table = soup.find('table', attrs={'class': 'flexible generaltable generalbox'}).find('tbody')
-        students = list()
-
-        for row in table.find_all('tr'):
-            columns = row.find_all('td')
-            anchor = columns[1].find('a')
-            if anchor is not None and columns[3].text == student_role:
-                name, profile_url = columns[1].text, anchor['href']
-                matcher = re.search(r'.*id=(\d+)&.*', profile_url)
-                moodle_id = matcher.group(1)
-                mail = columns[2].text
-                students.append((int(moodle_id), name, mail))
-
-        students = sorted(students, key=lambda t: t[2])
+        response = _require_login(self._session.get(course_url))
+        return parse_html(response.content)
+
+    def get_students(self, course_id, student_role, page_size=None):
+        students = sorted(self.iter_students(course_id, student_role, page_size), key=lambda t: t[2])
         return students
 
-    def find_submissions(self, course_id, exercise_prefix, exercise_number, printer):
+    def iter_students(self, course_id, student_role, page_size=None):
+        url = f'https://moodle.uni-heidelberg.de/user/index.php?id={course_id}'
+        is_target_table = has_classes('flexible', 'generaltable', 'generalbox')
+
+        if page_size is None:
+            rows = self._iter_streamed_rows('get', f'{url}&perpage=5000', is_target_table)
+        else:
+            rows = self._iter_paginated_rows(
+                lambda page: f'{url}&perpage={page_size}&page={page}',
+                is_target_table,
+                page_size
+            )
+
+        for columns in rows:
+            student = participant_from_row(columns, student_role)
+            if student is not None:
+                yield student
+
+    def find_submissions(self, course_id, exercise_prefix, exercise_number, printer, page_size=None):
+        return list(self.iter_submissions(course_id, exercise_prefix, exercise_number, printer, page_size))
+
+    def iter_submissions(self, course_id, exercise_prefix, exercise_number, printer, page_size=None):
         def is_matching_id(x):
             return x and x.startswith('section-')
 
@@ -105,57 +120,87 @@ class MoodleSession:
         soup = self.get_course_page(course_id)
         table = soup.find('ul', attrs={'class': 'topics'})
         section = table.find('li', attrs={"id": is_matching_id, "aria-label": is_matching_label})
-        submission_link = section.find('a', attrs={'href':is_matching_url})['href'] + "&action=grading"
-
-        soup = self._show_all_submissions(submission_link)
-        rows = soup.find('table').find('tbody').find_all('tr')
-
-        result = list()
-        for row in rows:
-            columns = row.find_all('td')
-            moodle_student_id = int(columns[0].find('input', attrs={'type':'checkbox'})['value'])
-            name = columns[2].find('a').text
-            download_anchor = columns[8].find_all('a', attrs={'target':'_blank'})
-
-            if len(download_anchor) > 0:
-                if len(download_anchor) > 1:
-                    printer.warning(f"'{name}' has uploaded more than one submission! Using latest...")
-                    download_anchor = download_anchor[-1]
-                else:
-                    download_anchor = download_anchor[0]
-
-                submission_name = download_anchor.text
-                submission_url = download_anchor['href']
-                data = {
-                    "moodle_student_id":moodle_student_id,
-                    "file_name": submission_name,
-                    "url": submission_url
-                }
-                result.append(SimpleNamespace(**data))
-
-        return result
+        submission_link = section.find('a', attrs={'href': is_matching_url})['href'] + "&action=grading"
+
+        if page_size is None:
+            rows = self._show_all_submissions(submission_link)
+        else:
+            self._save_grading_options(submission_link, page_size).close()
+            rows = self._iter_paginated_rows(
+                lambda page: f'{submission_link}&page={page}',
+                first_table,
+                page_size
+            )
+
+        for columns in rows:
+            submission = submission_from_row(columns, printer)
+            if submission is not None:
+                yield submission
 
     def _show_all_submissions(self, submission_link):
-        soup = BeautifulSoup(self._session.post(submission_link).content, 'html.parser')
-        context_id = soup.find('input', attrs={'name': 'contextid', 'type': 'hidden'})['value']
-        page_id = soup.find('input', attrs={'name': 'id', 'type': 'hidden'})['value']
-        user_id = soup.find('input', attrs={'name': 'userid', 'type': 'hidden'})['value']
-
-        response = self._session.post(submission_link, data={
-            'id': page_id,
-            'perpage': -1,
+        response = self._save_grading_options(submission_link, -1)
+        try:
+            yield from iter_table_rows(iter_response_text(response), first_table)
+        finally:
+            response.close()
+
+    def _save_grading_options(self, submission_link, page_size):
+        response = _require_login(self._session.post(submission_link, stream=True))
+        try:
+            hidden = find_hidden_inputs(iter_response_text(response), ('contextid', 'id', 'userid'))
+        finally:
+            response.close()
+
+        return _require_login(self._session.post(submission_link, stream=True, data={
+            'id': hidden['id'],
+            'perpage': page_size,
             'action': 'saveoptions',
-            'contextid': context_id,
-            'userid': user_id,
+            'contextid': hidden['contextid'],
+            'userid': hidden['userid'],
             'sesskey': self._logout_url.split('sesskey=')[1],
             '_qf__mod_assign_grading_options_form': 1,
             'mform_isexpanded_id_general': 1,
             'filter': None,
             'downloadasfolders': 1,
-        })
-        import time
-        time.sleep(3)
-        return BeautifulSoup(response.content, "html.parser")
+        }))
+
+    def _iter_streamed_rows(self, method, url, is_target_table):
+        response = _require_login(self._session.request(method, url, stream=True))
+        try:
+            yield from iter_table_rows(iter_response_text(response), is_target_table)
+        finally:
+            response.close()
+
+    def _fetch_page(self, url):
+        return _require_login(self._session.get(url)).text
+
+    def _iter_paginated_rows(self, url_of_page, is_target_table, page_size):
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = 0
+            previous_signature = None
+            pending = executor.submit(self._fetch_page, url_of_page(page))
+            while pending is not None:
+                rows = list(iter_table_rows((pending.result(),), is_target_table))
+                signature = tuple(cell.text for cell in rows[0]) if len(rows) > 0 else None
+
+                # only a full page can be followed by another one, which is fetched while the rows are processed
+                pending = None
+                if len(rows) >= page_size and signature != previous_signature:
+                    page += 1
+                    pending = executor.submit(self._fetch_page, url_of_page(page))
+
+                if signature != previous_signature:
+                    yield from rows
+                previous_signature = signature
 
     def download(self, source, target):
-        target.write(self._session.get(source).content)
+        target.write(_require_login(self._session.get(source)).content)
+
+
+def _require_login(response):
+    # an expired session is redirected to the login page instead of failing
+    redirected = response.status_code == 303 or any(r.status_code == 303 for r in response.history)
+    if redirected or response.url.startswith(LOGIN_URL):
+        response.close()
+        raise ConnectionRefusedError("Moodle is not online, please login first.")
+    return response
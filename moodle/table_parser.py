@@ -0,0 +1,203 @@
+import codecs
+import re
+from collections import deque
+from html.parser import HTMLParser
+from types import SimpleNamespace
+
+
+class TableRowParser(HTMLParser):
+    def __init__(self, is_target_table):
+        super().__init__(convert_charrefs=True)
+        self._is_target_table = is_target_table
+        self._rows = deque()
+
+        self._table_found = False
+        self._table_depth = 0
+        self._in_body = False
+        self._done = False
+
+        self._row = None
+        self._cell = None
+        self._anchors = list()
+
+    @property
+    def done(self):
+        return self._done
+
+    def pop_rows(self):
+        while len(self._rows) > 0:
+            yield self._rows.popleft()
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        attrs = dict(attrs)
+
+        if tag == 'table':
+            if self._table_found:
+                self._table_depth += 1
+            elif self._is_target_table(attrs):
+                self._table_found = True
+                self._table_depth = 1
+            return
+
+        if not self._table_found or self._table_depth != 1:
+            if self._cell is not None:
+                self._add_element(tag, attrs)
+            return
+
+        if tag == 'tbody':
+            self._in_body = True
+        elif tag == 'tr' and self._in_body:
+            self._row = list()
+        elif tag == 'td' and self._row is not None:
+            self._cell = SimpleNamespace(text=list(), anchors=list(), inputs=list())
+        elif self._cell is not None:
+            self._add_element(tag, attrs)
+
+    def _add_element(self, tag, attrs):
+        if tag == 'a':
+            anchor = dict(attrs)
+            anchor['text'] = list()
+            self._cell.anchors.append(anchor)
+            self._anchors.append(anchor)
+        elif tag == 'input':
+            self._cell.inputs.append(attrs)
+
+    def handle_endtag(self, tag):
+        if self._done or not self._table_found:
+            return
+
+        if tag == 'table':
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._done = True
+        elif self._table_depth != 1:
+            if tag == 'a' and len(self._anchors) > 0:
+                self._close_anchor()
+        elif tag == 'tbody':
+            self._in_body = False
+        elif tag == 'tr' and self._row is not None:
+            self._close_cell()
+            self._rows.append(self._row)
+            self._row = None
+        elif tag == 'td':
+            self._close_cell()
+        elif tag == 'a' and len(self._anchors) > 0:
+            self._close_anchor()
+
+    def _close_anchor(self):
+        anchor = self._anchors.pop()
+        anchor['text'] = ''.join(anchor['text'])
+
+    def _close_cell(self):
+        if self._cell is not None:
+            while len(self._anchors) > 0:
+                self._close_anchor()
+            self._cell.text = ''.join(self._cell.text)
+            self._row.append(self._cell)
+            self._cell = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.text.append(data)
+            for anchor in self._anchors:
+                anchor['text'].append(data)
+
+
+class HiddenInputParser(HTMLParser):
+    def __init__(self, names):
+        super().__init__(convert_charrefs=True)
+        self._names = set(names)
+        self.values = dict()
+
+    @property
+    def done(self):
+        return self._names.issubset(self.values.keys())
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'input':
+            attrs = dict(attrs)
+            name = attrs.get('name')
+            if attrs.get('type') == 'hidden' and name in self._names and name not in self.values:
+                self.values[name] = attrs.get('value')
+
+
+def iter_response_text(response, chunk_size=64 * 1024):
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_table_rows(chunks, is_target_table):
+    parser = TableRowParser(is_target_table)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_rows()
+        if parser.done:
+            break
+    parser.close()
+    yield from parser.pop_rows()
+
+
+def find_hidden_inputs(chunks, names):
+    parser = HiddenInputParser(names)
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.done:
+            break
+    parser.close()
+
+    missing = set(names) - parser.values.keys()
+    if len(missing) > 0:
+        raise ValueError(f"Missing hidden form fields {sorted(missing)} (table_parser.py: find_hidden_inputs)")
+
+    return parser.values
+
+
+def has_classes(*classes):
+    def is_target_table(attrs):
+        return set(classes).issubset((attrs.get('class') or '').split())
+
+    return is_target_table
+
+
+def first_table(attrs):
+    return True
+
+
+def participant_from_row(columns, student_role):
+    if len(columns) < 4:
+        return None
+
+    anchors = [anchor for anchor in columns[1].anchors if 'href' in anchor]
+    if len(anchors) == 0 or columns[3].text != student_role:
+        return None
+
+    matcher = re.search(r'.*id=(\d+)&.*', anchors[0]['href'])
+    return int(matcher.group(1)), columns[1].text, columns[2].text
+
+
+def submission_from_row(columns, printer):
+    if len(columns) < 9:
+        return None
+
+    checkboxes = [inp for inp in columns[0].inputs if inp.get('type') == 'checkbox']
+    moodle_student_id = int(checkboxes[0]['value'])
+    name = columns[2].anchors[0]['text']
+    download_anchor = [anchor for anchor in columns[8].anchors if anchor.get('target') == '_blank']
+
+    if len(download_anchor) == 0:
+        return None
+
+    if len(download_anchor) > 1:
+        printer.warning(f"'{name}' has uploaded more than one submission! Using latest...")
+    download_anchor = download_anchor[-1]
+
+    data = {
+        "moodle_student_id": moodle_student_id,
+        "file_name": download_anchor['text'],
+        "url": download_anchor['href']
+    }
+    return SimpleNamespace(**data)
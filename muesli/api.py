@@ -1,9 +1,9 @@
 import re
 
-from bs4 import BeautifulSoup
-from requests import Session
-
 from data.data import Student, Tutorial
+from util.http import new_session, parse_html
+from util.metrics import HTTP_METRICS
+from util.session import cookies_to_json, restore_cookies
 
 
 class MuesliSession:
@@ -25,7 +25,7 @@ class MuesliSession:
     def get(self, url, parse=True):
         result = self._session.get(url)
         if result.status_code == 200 and parse:
-            result = BeautifulSoup(result.content, "html.parser")
+            result = parse_html(result.content)
         else:
             if self.online:
                 raise ConnectionError(f"Http GET failed with {result.status_code}.")
@@ -52,19 +52,27 @@ class MuesliSession:
         return self
 
     def login(self):
-        self._session = Session()
+        self._session = new_session()
         login_url = 'https://muesli.mathi.uni-heidelberg.de/user/login'
         response = self._session.post(login_url, data={
             'email': self._account.email,
             'password': self._account.password
         })
-        soup = BeautifulSoup(response.content, 'html.parser')
+        soup = parse_html(response.content)
         error_element = soup.find('p', attrs={'class': 'error'})
         if error_element is not None:
             raise ConnectionRefusedError('Wrong username or password.')
 
         self._logout_url = 'https://muesli.mathi.uni-heidelberg.de/user/logout'
 
+    def export_state(self):
+        return {"cookies": cookies_to_json(self._session.cookies), "logout_url": self._logout_url}
+
+    def restore_state(self, state):
+        self._session = new_session()
+        restore_cookies(self._session.cookies, state["cookies"])
+        self._logout_url = state["logout_url"]
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.logout()
 
@@ -231,6 +239,7 @@ class MuesliSession:
         return response.status_code == 200
 
     def _get_presented_url(self, present_name, tutorial_id):
+        HTTP_METRICS.record_cache("muesli.present_url", tutorial_id in self._present_urls)
         if tutorial_id in self._present_urls:
             present_url = self._present_urls[tutorial_id]
         else:
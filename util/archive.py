@@ -0,0 +1,341 @@
+import multiprocessing
+import os
+import shutil
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from json import dump as json_save
+from types import SimpleNamespace
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar.gz", ".tar", ".7z")
+
+EXTENSION_FORMATS = {
+    ".zip": "zip",
+    ".tar.gz": "gztar",
+    ".tar": "tar",
+    ".7z": "7zip"
+}
+
+FORMAT_LABELS = {
+    "zip": "zip",
+    "7zip": "7z",
+    "tar": "tar",
+    "gztar": "tar.gz",
+    "bztar": "tar.bz2",
+    "xztar": "tar.xz"
+}
+
+MAGIC_NUMBERS = (
+    (0, b'PK\x03\x04', "zip"),
+    (0, b'PK\x05\x06', "zip"),
+    (0, b'PK\x07\x08', "zip"),
+    (0, b'7z\xbc\xaf\x27\x1c', "7zip"),
+    (0, b'\x1f\x8b', "gztar"),
+    (0, b'BZh', "bztar"),
+    (0, b'\xfd7zXZ\x00', "xztar"),
+    (257, b'ustar', "tar"),
+)
+
+UNSUPPORTED_MAGIC_NUMBERS = (
+    (0, b'Rar!\x1a\x07', "rar"),
+    (0, b'%PDF', "pdf"),
+)
+
+
+TAR_STREAM_MODES = {
+    "tar": "r|",
+    "gztar": "r|gz",
+    "bztar": "r|bz2",
+    "xztar": "r|xz"
+}
+
+DEFAULT_EXTRACTION_CONFIG = {
+    "include": [],
+    "exclude": ["__MACOSX", ".DS_Store", "Thumbs.db", ".git", ".svn", ".hg", ".idea", ".vscode", "__pycache__",
+                ".ipynb_checkpoints", ".pytest_cache", "venv", ".venv", "node_modules", "cmake-build-*",
+                "*.pyc", "*.o", "*.class", "*.exe"],
+    "max_total_size": 256 * 2 ** 20,
+    "max_file_size": 32 * 2 ** 20,
+    "max_entries": 10000,
+    "max_compression_ratio": 200,
+    "time_limit": 300
+}
+
+RATIO_GRACE_SIZE = 16 * 2 ** 20
+CHUNK_SIZE = 2 ** 20
+MAX_RECORDED_SKIPS = 100
+
+
+class ExtractionAborted(Exception):
+    pass
+
+
+class ExtractionBudget:
+    def __init__(self, limits, archive_size):
+        self._limits = limits
+        self._archive_size = max(archive_size, 1)
+        self.entries = 0
+        self.written = 0
+        self.skipped = dict()
+
+    @property
+    def max_file_size(self):
+        return self._limits.max_file_size
+
+    def skip_reason(self, name, size, is_directory=False):
+        parts = [part for part in name.split('/') if len(part) > 0]
+        for i, part in enumerate(parts):
+            if any(fnmatch(part, pattern) for pattern in self._limits.exclude):
+                return '/'.join(parts[:i + 1]) + ('/' if i + 1 < len(parts) or is_directory else ''), "excluded"
+
+        if is_directory:
+            return None
+
+        if len(self._limits.include) > 0 \
+                and not any(fnmatch(name, pattern) or fnmatch(parts[-1], pattern) for pattern in self._limits.include):
+            return name, "not included"
+
+        if size is not None and size > self._limits.max_file_size:
+            return name, "too large"
+
+        return None
+
+    def skip(self, key, reason, size=0):
+        entry = self.skipped.setdefault(key, {"name": key, "reason": reason, "entries": 0, "bytes": 0})
+        entry["entries"] += 1
+        entry["bytes"] += size or 0
+
+    def count_entry(self):
+        self.entries += 1
+        if self.entries > self._limits.max_entries:
+            raise ExtractionAborted(f"more than {self._limits.max_entries} entries")
+
+    def count_bytes(self, size):
+        self.written += size
+        if self.written > self._limits.max_total_size:
+            raise ExtractionAborted(f"more than {self._limits.max_total_size} bytes uncompressed")
+
+        ratio = self.written / self._archive_size
+        if self.written > RATIO_GRACE_SIZE and ratio > self._limits.max_compression_ratio:
+            raise ExtractionAborted(f"compression ratio above {self._limits.max_compression_ratio}")
+
+    def skipped_summary(self):
+        entries = sorted(self.skipped.values(), key=lambda e: e["name"])
+        return {
+            "count": sum(entry["entries"] for entry in entries),
+            "bytes": sum(entry["bytes"] for entry in entries),
+            "entries": entries[:MAX_RECORDED_SKIPS]
+        }
+
+
+def extraction_limits(config=None):
+    values = dict(DEFAULT_EXTRACTION_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    return SimpleNamespace(**values)
+
+
+def split_archive_name(file):
+    if file.endswith(".tar.gz"):
+        extension = ".tar.gz"
+        file_name = file[:-len(extension)]
+    else:
+        file_name, extension = os.path.splitext(file)
+
+    return file_name, extension
+
+
+def detect_archive_format(path):
+    with open(path, 'rb') as fp:
+        header = fp.read(512)
+
+    for offset, magic_number, archive_format in MAGIC_NUMBERS + UNSUPPORTED_MAGIC_NUMBERS:
+        if header[offset:offset + len(magic_number)] == magic_number:
+            return archive_format
+
+    return None
+
+
+def _safe_path(target_path, name):
+    name = name.replace('\\', '/')
+    parts = [part for part in name.split('/') if part not in ('', '.')]
+    if len(parts) == 0 or '..' in parts or os.path.isabs(name) or ':' in parts[0]:
+        return None
+    return os.path.join(target_path, *parts)
+
+
+def _copy_stream(source, path, budget):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'wb') as fp:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            budget.count_bytes(len(chunk))
+            if written > budget.max_file_size:
+                break
+            fp.write(chunk)
+
+    if written > budget.max_file_size:
+        os.remove(path)
+        return None
+
+    return written
+
+
+def _extract_zip(source_path, target_path, budget):
+    with zipfile.ZipFile(source_path) as archive:
+        for info in archive.infolist():
+            _extract_member(info.filename, info.file_size, info.is_dir(), True, target_path, budget,
+                            lambda: archive.open(info))
+
+
+def _extract_tar(source_path, target_path, budget, archive_format):
+    with tarfile.open(source_path, mode=TAR_STREAM_MODES[archive_format]) as archive:
+        for member in archive:
+            _extract_member(member.name, member.size, member.isdir(), member.isfile(), target_path, budget,
+                            lambda: archive.extractfile(member))
+
+
+def _extract_7zip(source_path, target_path, budget):
+    from py7zr import SevenZipFile
+
+    with SevenZipFile(source_path, mode='r') as archive:
+        targets = list()
+        for info in archive.list():
+            name = info.filename.replace('\\', '/')
+            budget.count_entry()
+            skip = budget.skip_reason(name, info.uncompressed, info.is_directory)
+            if skip is not None:
+                budget.skip(*skip, size=info.uncompressed)
+            elif _safe_path(target_path, name) is None:
+                budget.skip(name, "unsafe path", size=info.uncompressed)
+            else:
+                if not info.is_directory:
+                    budget.count_bytes(info.uncompressed or 0)
+                targets.append(info.filename)
+
+        archive.reset()
+        archive.extract(path=target_path, targets=targets)
+
+
+def _extract_member(name, size, is_directory, is_file, target_path, budget, open_member):
+    budget.count_entry()
+    skip = budget.skip_reason(name, size, is_directory)
+    if skip is not None:
+        budget.skip(*skip, size=size)
+        return
+
+    path = _safe_path(target_path, name)
+    if path is None:
+        budget.skip(name, "unsafe path", size=size)
+    elif is_directory:
+        os.makedirs(path, exist_ok=True)
+    elif not is_file:
+        budget.skip(name, "link or special file")
+    else:
+        with open_member() as source:
+            if _copy_stream(source, path, budget) is None:
+                budget.skip(name, "too large", size=size)
+
+
+def extract_submission(plan):
+    problems = list(plan.problems)
+    result = SimpleNamespace(file=plan.file, target_path=plan.target_path, problems=problems, log=list(),
+                             skipped=None, success=False)
+
+    archive_format = detect_archive_format(plan.source_path)
+    if archive_format not in FORMAT_LABELS:
+        description = "unknown" if archive_format is None else archive_format
+        result.log.append(f"Not supported archive-format: '{plan.extension}' (content is {description})")
+        return result
+
+    if archive_format != EXTENSION_FORMATS.get(plan.extension):
+        problems.append(f"Wrong file extension provided - this file was actually a {FORMAT_LABELS[archive_format]}!")
+
+    target_existed = os.path.exists(plan.target_path)
+    budget = ExtractionBudget(plan.limits, os.path.getsize(plan.source_path))
+    try:
+        os.makedirs(plan.target_path, exist_ok=True)
+        if archive_format == "zip":
+            _extract_zip(plan.source_path, plan.target_path, budget)
+        elif archive_format == "7zip":
+            _extract_7zip(plan.source_path, plan.target_path, budget)
+        else:
+            _extract_tar(plan.source_path, plan.target_path, budget, archive_format)
+    except ExtractionAborted as e:
+        _remove_output(plan.target_path, target_existed)
+        result.log.append(f"Aborted: {plan.file} exceeds the extraction limits ({e})!")
+        return result
+    except Exception as e:
+        _remove_output(plan.target_path, target_existed)
+        result.log.append(f"Fatal error: {plan.file} could not be unpacked! ({e.__class__.__name__}: {e})")
+        return result
+
+    result.skipped = budget.skipped_summary()
+    with open(os.path.join(plan.target_path, "submission_meta.json"), 'w', encoding='utf-8') as fp:
+        data = {
+            "original_name": plan.file,
+            "problems": problems,
+            "skipped": result.skipped
+        }
+        json_save(data, fp)
+
+    result.success = True
+    return result
+
+
+def _remove_output(target_path, target_existed):
+    if not target_existed:
+        shutil.rmtree(target_path, ignore_errors=True)
+
+
+def _extraction_process(plan, connection):
+    try:
+        connection.send(extract_submission(plan))
+    except BaseException as e:
+        connection.send(_failed_result(plan, f'{e.__class__.__name__}: {e}'))
+    finally:
+        connection.close()
+
+
+def _failed_result(plan, message):
+    return SimpleNamespace(file=plan.file, target_path=plan.target_path, problems=plan.problems, log=[message],
+                           skipped=None, success=False)
+
+
+def extract_in_subprocess(plan):
+    target_existed = os.path.exists(plan.target_path)
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_extraction_process, args=(plan, sender), daemon=True)
+    process.start()
+    sender.close()
+
+    try:
+        if receiver.poll(plan.limits.time_limit):
+            result = receiver.recv()
+        else:
+            process.kill()
+            _remove_output(plan.target_path, target_existed)
+            result = _failed_result(plan, f"Aborted: extraction took longer than {plan.limits.time_limit} seconds!")
+    except EOFError:
+        result = _failed_result(plan, f"Fatal error: extraction process exited with {process.exitcode}")
+    finally:
+        process.join()
+        receiver.close()
+
+    return result
+
+
+def extract_all(plans, max_workers=None):
+    if len(plans) == 0:
+        return list()
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(plans))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(extract_in_subprocess, plans))
+
+    return sorted(results, key=lambda r: r.file)
@@ -1,4 +1,27 @@
+import json
 import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+DEFAULT_CONSOLE_CONFIG = {
+    "output": "text",
+    "pager": True,
+    "flush_interval": 0.1
+}
+OUTPUT_MODES = ("text", "quiet", "json")
+LEVEL_COLORS = {'confirm': 'green', 'warning': 'orange', 'error': 'red'}
+
+
+def console_settings(config=None):
+    values = dict(DEFAULT_CONSOLE_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    if values["output"] not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode '{values['output']}', expected one of {', '.join(OUTPUT_MODES)} "
+                         f"(console.py: console_settings)")
+    return SimpleNamespace(**values)
 
 
 def clear():
@@ -14,14 +37,27 @@ def colored_string(message, color):
 
 
 class ConsoleFormatter:
-    def __init__(self):
+    def __init__(self, output='text', pager=False, flush_interval=0.0, stream=None):
         self._indentation_level = 0
         self._buffer = ' ' * 3
+        self._output = output
+        self._pager = pager
+        self._flush_interval = flush_interval
+        self._stream = stream
+        self._lock = threading.RLock()
+        self._pending = list()
+        self._line = list()
+        self._last_flush = time.perf_counter()
+        self._timer = None
 
     @property
     def indentation(self):
         return self._buffer * self._indentation_level
 
+    @property
+    def output(self):
+        return self._output
+
     def indent(self):
         self._indentation_level += 1
 
@@ -30,18 +66,21 @@ class ConsoleFormatter:
             self._indentation_level -= 1
 
     def inform(self, message='', end='\n'):
-        print(f"{self.indentation}{message}", end=end)
+        self._write('inform', message, end)
 
     def confirm(self, message, end='\n'):
-        print(f"{self.indentation}{colored_string(message, 'green')}", end=end)
+        self._write('confirm', message, end)
 
     def warning(self, warning, end='\n'):
-        print(f"{self.indentation}{colored_string(warning, 'orange')}", end=end)
+        self._write('warning', warning, end)
 
     def error(self, error, end='\n'):
-        print(f"{self.indentation}{colored_string(error, 'red')}", end=end)
+        self._write('error', error, end)
 
     def input(self, message=""):
+        self.flush()
+        if self._output != 'text':
+            return input()
         return input(f"{self.indentation}{message}")
 
     def ask(self, question):
@@ -49,6 +88,68 @@ class ConsoleFormatter:
         answer = self.input(">: ")
         return answer
 
+    def flush(self, page=False):
+        with self._lock:
+            text = ''.join(self._pending)
+            self._pending = list()
+            self._last_flush = time.perf_counter()
+            if len(text) == 0:
+                return
+
+            stream = self._stream or sys.stdout
+            if page and self._pager and self._output == 'text' and _exceeds_terminal(stream, text) \
+                    and _page(text, stream):
+                return
+            stream.write(text)
+            stream.flush()
+
+    def write_direct(self, text):
+        with self._lock:
+            if self._output == 'text':
+                # keep the order: everything printed through the printer before has to come first
+                self.flush()
+                stream = self._stream or sys.stdout
+                stream.write(text)
+                stream.flush()
+            else:
+                for part in text.splitlines(keepends=True):
+                    complete = part.endswith('\n')
+                    self._write('inform', part[:-1] if complete else part, '\n' if complete else '')
+
+    def _write(self, level, message, end):
+        with self._lock:
+            if self._output == 'text':
+                if level in LEVEL_COLORS:
+                    message = colored_string(message, LEVEL_COLORS[level])
+                self._pending.append(f"{self.indentation}{message}{end}")
+                if not end.endswith('\n'):
+                    self.flush()
+                    return
+            else:
+                # quiet and json mode only emit complete lines, the level of the last part decides
+                complete = end.endswith('\n')
+                self._line.append(f"{message}{end[:-1] if complete else end}")
+                if not complete:
+                    return
+                line, self._line = ''.join(self._line), list()
+                if self._output == 'json':
+                    record = {"level": level, "indent": self._indentation_level, "message": line}
+                    self._pending.append(json.dumps(record, ensure_ascii=False) + '\n')
+                elif level in ('warning', 'error'):
+                    self._pending.append(f"{self.indentation}{colored_string(line, LEVEL_COLORS[level])}\n")
+
+            if time.perf_counter() - self._last_flush >= self._flush_interval:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._flush_interval, self._flush_on_time)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_time(self):
+        with self._lock:
+            self._timer = None
+            self.flush()
+
     def __enter__(self):
         self.indent()
         return self
@@ -57,6 +158,79 @@ class ConsoleFormatter:
         self.outdent()
 
 
+def _exceeds_terminal(stream, text):
+    try:
+        if not stream.isatty():
+            return False
+        lines = os.get_terminal_size(stream.fileno()).lines
+    except (AttributeError, ValueError, OSError):
+        return False
+    return text.count('\n') >= lines - 1
+
+
+def _page(text, stream):
+    import shutil
+    import subprocess
+    command = os.environ.get('PAGER') or ('less' if shutil.which('less') else None)
+    if command is None:
+        return False
+
+    environment = dict(os.environ)
+    environment.setdefault('LESS', '-R -F -X')
+    try:
+        process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, env=environment)
+        process.communicate(text.encode(getattr(stream, 'encoding', None) or 'utf-8', 'replace'))
+    except OSError:
+        return False
+    except KeyboardInterrupt:
+        pass
+    return True
+
+
+class PrinterStream:
+    def __init__(self, printer, stream):
+        self._printer = printer
+        self._stream = stream
+
+    def write(self, text):
+        self._printer.write_direct(text)
+        return len(text)
+
+    def flush(self):
+        self._printer.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RecordingPrinter(ConsoleFormatter):
+    def __init__(self):
+        super().__init__()
+        self.messages = list()
+        self._line = list()
+
+    def _record(self, level, message, end):
+        self._line.append(str(message))
+        if end == '\n':
+            self.messages.append((level, f"{self.indentation}{''.join(self._line)}"))
+            self._line = list()
+
+    def inform(self, message='', end='\n'):
+        self._record('inform', message, end)
+
+    def confirm(self, message, end='\n'):
+        self._record('confirm', message, end)
+
+    def warning(self, warning, end='\n'):
+        self._record('warning', warning, end)
+
+    def error(self, error, end='\n'):
+        self._record('error', error, end)
+
+    def input(self, message=""):
+        raise RuntimeError("Interactive input is not available in a worker process (console.py: RecordingPrinter)")
+
+
 def string_framed_line(title, length=120, orientation='^', style='-'):
     lines = list()
     length -= 2
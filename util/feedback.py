@@ -1,9 +1,13 @@
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from json import dump as j_dump
+from types import SimpleNamespace
 
 from data.storage import ensure_folder_exists
-from util.console import string_table, align_vertical
+from util.console import string_table, RecordingPrinter
+
+_worker_roster = None
 
 
 class FeedbackPolisher:
@@ -16,47 +20,44 @@ class FeedbackPolisher:
         self._students = self._find_students()
         self._segments = self._read_segments()
 
-        self._analyze_credit_annotations()
+        self._write_task_headers()
         self._generate_salutation()
 
         table, self._credits_per_task = self._generate_table()
-        self._feedback = self._polish_feedback(table)
+        self._blocks, self._width = self._polish_feedback(table)
 
     def _read_segments(self):
-        segments = dict()
+        task_pattern = re.compile(self._task_prefix + r'(?P<task_number>\d)\s+\[Max: (?P<max_credit>\d+\.\d+)\]')
+        credit_pattern = re.compile(r'\[@(?P<credit>[-+]?\d+(?:\.\d+)?)\]')
+        task_start = self._task_prefix[:1]
+
+        group = {"lines": list()}
+        segments = {"__intro__": group}
         with open(self._path, 'r', encoding='utf-8') as fp:
-            task_pattern = re.compile(self._task_prefix + r'(?P<task_number>\d)\s+\[Max: (?P<max_credit>\d+\.\d+)\]')
-            buffer = list()
-            group_type = "__intro__"
             for line in fp:
-                line = line[:-1]
-                matcher = task_pattern.match(line)
+                if line.endswith('\n'):
+                    line = line[:-1]
+
+                matcher = task_pattern.match(line) if line.startswith(task_start) else None
                 if matcher:
                     task_number = int(matcher.group("task_number"))
                     max_credits = float(matcher.group("max_credit"))
-                    if group_type == "__intro__":
-                        segments[group_type] = {"lines": list(buffer)}
-                    else:
-                        segments[group_type]["lines"] = list(buffer)
-                    group_type = task_number
-                    segments[group_type] = {"task_number": task_number, "max_credits": max_credits}
-                    buffer = list()
-                buffer.append(line)
-            segments[group_type]["lines"] = list(buffer)
+                    group = {"task_number": task_number, "max_credits": max_credits, "achieved_credits": max_credits,
+                             "lines": list()}
+                    segments[task_number] = group
+                elif '[@' in line and "task_number" in group:
+                    for credit in credit_pattern.finditer(line):
+                        group["achieved_credits"] += float(credit.group("credit"))
 
-        return segments
+                group["lines"].append(line)
 
-    def _analyze_credit_annotations(self):
-        credit_pattern = re.compile(r'\[@(?P<credit>([-+])?\d+(\.\d+)?)\]')
+        return segments
 
+    def _write_task_headers(self):
         for group_type, group in self._segments.items():
             if group_type != "__intro__":
                 max_credits = group["max_credits"]
-                achieved_credits = max_credits
-                for line in group["lines"]:
-                    for entry in re.findall(credit_pattern, line):
-                        credit = float(entry[0])
-                        achieved_credits += credit
+                achieved_credits = group["achieved_credits"]
                 group["achieved_credits"] = (achieved_credits if achieved_credits >= 0.0 else 0.0)
 
                 task_name = f'{self._task_prefix} {group["task_number"]}'
@@ -123,13 +124,9 @@ class FeedbackPolisher:
 
     def _polish_feedback(self, table):
         table = ["\n"] + table + ["\n"]
-
-        feedback = self._segments["__intro__"]["lines"]
-        feedback = align_vertical(feedback, self._salutation, alignment='^')
-        feedback = align_vertical(feedback, table, alignment='^')
-        for group_type, group in self._segments.items():
-            if group_type != "__intro__":
-                feedback = align_vertical(feedback, group["lines"])
+        intro = self._segments["__intro__"]["lines"] + self._salutation
+        tasks = [line for group_type, group in self._segments.items() if group_type != "__intro__"
+                 for line in group["lines"]]
 
         footer = list()
         footer.append("\n")
@@ -138,9 +135,32 @@ class FeedbackPolisher:
         footer.append(f"Fragen zur Korrektur könnt ihr gerne per Mail ({self._storage.muesli_account.email})")
         footer.append(f"oder per Privatnachricht in Discord stellen.")
 
-        feedback = align_vertical(feedback, footer)
+        intro_width = max((len(line) for line in intro), default=0)
+        table_width = max(intro_width, max(len(line) for line in table))
+        width = max(table_width, max((len(line) for line in tasks + footer), default=0))
+
+        # The intro is centered within its own block first and then within the table block
+        intro_offset = (table_width - intro_width) // 2
+        blocks = [
+            [(intro_offset + (intro_width - len(line)) // 2, line) for line in intro],
+            [((table_width - len(line)) // 2, line) for line in table],
+            [(0, line) for line in tasks + footer]
+        ]
+
+        return blocks, width
 
-        return feedback
+    def _iter_feedback(self):
+        for block in self._blocks:
+            for offset, line in block:
+                yield f"{' ' * offset}{line:<{self._width - offset}}\n"
+
+    @property
+    def students(self):
+        return list(self._students)
+
+    @property
+    def credits_per_task(self):
+        return list(self._credits_per_task)
 
     def save_meta_to_folder(self, directory):
         ensure_folder_exists(directory)
@@ -155,5 +175,37 @@ class FeedbackPolisher:
 
         feedback_path = os.path.join(directory, self._file_name)
         with open(feedback_path, 'w', encoding="utf-8") as fp:
-            for line in self._feedback:
-                print(line, file=fp)
+            fp.writelines(self._iter_feedback())
+
+
+def _init_consolidation_worker(roster):
+    global _worker_roster
+    _worker_roster = roster
+
+
+def consolidate_directory(job):
+    printer = RecordingPrinter()
+    result = SimpleNamespace(directory=job.directory, content_hash=job.content_hash, success=False, names=list(),
+                             credits_per_task=list(), messages=printer.messages, error=None)
+    try:
+        polisher = FeedbackPolisher(_worker_roster, job.working_directory, printer)
+        polisher.save_meta_to_folder(job.finished_directory)
+        result.names = [student.muesli_name for student in polisher.students]
+        result.credits_per_task = polisher.credits_per_task
+        result.success = True
+    except Exception as e:
+        result.error = f'{e.__class__.__name__}: {e}'
+
+    return result
+
+
+def consolidate_all(roster, jobs, max_workers=None):
+    if len(jobs) == 0:
+        return list()
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_consolidation_worker,
+                             initargs=(roster,)) as executor:
+        results = list(executor.map(consolidate_directory, jobs))
+
+    return results
@@ -0,0 +1,14 @@
+from util.metrics import HTTP_METRICS
+from util.timing import trace_response
+
+
+def new_session():
+    from requests import Session
+    session = Session()
+    session.hooks["response"].append(trace_response)
+    return HTTP_METRICS.install(session)
+
+
+def parse_html(content):
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, "html.parser")
@@ -0,0 +1,166 @@
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+
+DEFAULT_MEMORY_CONFIG = {
+    "trace_on_startup": False,
+    "frames": 1,
+    "sample_interval": None,
+    "sample_folder": None,
+    "max_samples": 20
+}
+BUFFER_TYPES = (bytes, bytearray, memoryview)
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>",
+                  "<unknown>")
+
+
+def memory_settings(config=None):
+    values = dict(DEFAULT_MEMORY_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    return SimpleNamespace(**values)
+
+
+class MemoryProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_snapshot = None
+        self._sampler = None
+        self._stop_sampler = threading.Event()
+        self._samples = list()
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    @property
+    def sampling(self):
+        return self._sampler is not None and self._sampler.is_alive()
+
+    @property
+    def samples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def start(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        self.stop_sampler()
+        with self._lock:
+            self._last_snapshot = None
+        tracemalloc.stop()
+
+    def traced_memory(self):
+        if not tracemalloc.is_tracing():
+            return 0, 0
+        return tracemalloc.get_traced_memory()
+
+    def reset_peak(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def snapshot(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Memory tracing is not running, start it with 'memory --start'.")
+        return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, file_name)
+                                                          for file_name in _IGNORED_FILES])
+
+    def top(self, limit=10, group_by='lineno'):
+        snapshot = self.snapshot()
+        with self._lock:
+            self._last_snapshot = snapshot
+        return [_site(statistic.traceback, statistic.size, statistic.count)
+                for statistic in snapshot.statistics(group_by)[:limit]]
+
+    def growth(self, limit=10, group_by='lineno'):
+        snapshot = self.snapshot()
+        with self._lock:
+            previous, self._last_snapshot = self._last_snapshot, snapshot
+        if previous is None:
+            return None
+
+        differences = snapshot.compare_to(previous, group_by)
+        changed = [difference for difference in differences if difference.size_diff != 0]
+        return [_site(difference.traceback, difference.size, difference.count, difference.size_diff,
+                      difference.count_diff) for difference in changed[:limit]]
+
+    def dump(self, path):
+        snapshot = self.snapshot()
+        snapshot.dump(path)
+        return len(snapshot.traces)
+
+    def start_sampler(self, interval, folder, max_samples=DEFAULT_MEMORY_CONFIG["max_samples"]):
+        self.start()
+        self.stop_sampler()
+        os.makedirs(folder, exist_ok=True)
+
+        self._stop_sampler = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, args=(interval, folder, max_samples,
+                                                                    self._stop_sampler),
+                                         name="memory-sampler", daemon=True)
+        self._sampler.start()
+
+    def stop_sampler(self):
+        if self._sampler is not None:
+            self._stop_sampler.set()
+            self._sampler.join()
+            self._sampler = None
+
+    def _sample(self, interval, folder, max_samples, stopped):
+        while not stopped.wait(interval):
+            if not tracemalloc.is_tracing():
+                break
+
+            current, peak = tracemalloc.get_traced_memory()
+            path = os.path.join(folder, f'memory_{datetime.now():%Y%m%d_%H%M%S_%f}.snapshot')
+            self.snapshot().dump(path)
+            with self._lock:
+                self._samples.append(SimpleNamespace(time=datetime.now(), current=current, peak=peak, path=path))
+                while len(self._samples) > max_samples:
+                    outdated = self._samples.pop(0)
+                    if os.path.exists(outdated.path):
+                        os.remove(outdated.path)
+
+
+def live_objects(limit=10, type_filter=None):
+    gc.collect()
+    counts = defaultdict(lambda: [0, 0])
+    seen_buffers = set()
+
+    for obj in gc.get_objects():
+        entry = counts[_type_name(obj)]
+        entry[0] += 1
+        entry[1] += sys.getsizeof(obj, 0)
+
+        # byte buffers are not tracked by the garbage collector, so they are found through their owners
+        for referent in gc.get_referents(obj):
+            if isinstance(referent, BUFFER_TYPES) and id(referent) not in seen_buffers:
+                seen_buffers.add(id(referent))
+                entry = counts[_type_name(referent)]
+                entry[0] += 1
+                entry[1] += sys.getsizeof(referent, 0)
+
+    result = [SimpleNamespace(type=name, count=count, size=size) for name, (count, size) in counts.items()
+              if type_filter is None or type_filter.lower() in name.lower()]
+    return sorted(result, key=lambda entry: entry.size, reverse=True)[:limit]
+
+
+def _type_name(obj):
+    cls = type(obj)
+    return cls.__name__ if cls.__module__ == 'builtins' else f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _site(traceback, size, count, size_diff=0, count_diff=0):
+    frame = traceback[0]
+    return SimpleNamespace(site=f'{frame.filename}:{frame.lineno}', size=size, count=count, size_diff=size_diff,
+                           count_diff=count_diff)
+
+
+MEMORY_PROFILER = MemoryProfiler()
@@ -0,0 +1,169 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from json import dump as j_dump
+from types import SimpleNamespace
+from urllib.parse import urlsplit, parse_qsl
+
+_NUMERIC_SEGMENT = re.compile(r'^\d+$')
+
+
+def endpoint_template(url):
+    parts = urlsplit(url)
+    segments = ['{id}' if _NUMERIC_SEGMENT.match(segment) else segment for segment in parts.path.split('/')]
+    template = '/'.join(segments).strip('/')
+    keys = sorted({key for key, _ in parse_qsl(parts.query, keep_blank_values=True)})
+    if len(keys) > 0:
+        template += '?' + '&'.join(f'{key}={{}}' for key in keys)
+    return template
+
+
+class HttpMetrics:
+    def __init__(self, max_records=100000):
+        self.max_records = max_records
+        self.context = 'startup'
+        self._lock = threading.Lock()
+        self._records = list()
+        self._cache = defaultdict(lambda: [0, 0])
+        self._dropped = 0
+
+    def attributed_to(self, context):
+        return _Context(self, context)
+
+    def install(self, session):
+        request = session.request
+
+        def metered_request(method, url, *args, **kwargs):
+            start = time.perf_counter()
+            response = request(method, url, *args, **kwargs)
+            self.record_response(response, time.perf_counter() - start, kwargs.get('stream', False))
+            return response
+
+        session.request = metered_request
+        return session
+
+    def record_response(self, response, latency, streamed=False):
+        record = SimpleNamespace(
+            context=self.context,
+            service=urlsplit(response.request.url).netloc.split('.')[0],
+            method=response.request.method,
+            endpoint=endpoint_template(response.request.url),
+            status=response.status_code,
+            latency=latency,
+            bytes=None,
+            from_cache=getattr(response, 'from_cache', False)
+        )
+
+        if streamed:
+            content_length = response.headers.get('Content-Length')
+            record.bytes = int(content_length) if content_length is not None else None
+            close = response.close
+
+            def close_and_count():
+                tell = getattr(response.raw, 'tell', None)
+                if tell is not None:
+                    record.bytes = tell()
+                close()
+
+            response.close = close_and_count
+        else:
+            record.bytes = len(response.content)
+
+        with self._lock:
+            if len(self._records) < self.max_records:
+                self._records.append(record)
+            else:
+                self._dropped += 1
+
+    def record_cache(self, name, hit):
+        with self._lock:
+            self._cache[(self.context, name)][0 if hit else 1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._records.clear()
+            self._cache.clear()
+            self._dropped = 0
+
+    def by_endpoint(self):
+        return self._rollup(lambda record: (record.service, record.method, record.endpoint))
+
+    def by_context(self):
+        rollup = self._rollup(lambda record: (record.context,))
+        with self._lock:
+            cache = dict(self._cache)
+
+        for entry in rollup:
+            hits = [counts for (context, _), counts in cache.items() if context == entry.key[0]]
+            entry.cache_hits += sum(counts[0] for counts in hits)
+            entry.cache_misses += sum(counts[1] for counts in hits)
+        return rollup
+
+    def cache_statistics(self):
+        with self._lock:
+            return {f'{context}: {name}': {"hits": hits, "misses": misses}
+                    for (context, name), (hits, misses) in self._cache.items()}
+
+    def export_json(self, path):
+        with self._lock:
+            records = [vars(record) for record in self._records]
+            dropped = self._dropped
+
+        data = {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "dropped_records": dropped,
+            "endpoints": [vars(entry) for entry in self.by_endpoint()],
+            "contexts": [vars(entry) for entry in self.by_context()],
+            "caches": self.cache_statistics(),
+            "requests": records
+        }
+        with open(path, 'w', encoding='utf-8') as fp:
+            j_dump(data, fp, indent=4)
+
+        return len(records)
+
+    def _rollup(self, key_of):
+        with self._lock:
+            records = list(self._records)
+
+        groups = defaultdict(list)
+        for record in records:
+            groups[key_of(record)].append(record)
+
+        result = list()
+        for key, group in groups.items():
+            latencies = sorted(record.latency for record in group)
+            result.append(SimpleNamespace(
+                key=list(key),
+                requests=len(group),
+                errors=sum(1 for record in group if record.status >= 400),
+                bytes=sum(record.bytes or 0 for record in group),
+                total_latency=sum(latencies),
+                p50_latency=latencies[(len(latencies) - 1) // 2],
+                max_latency=latencies[-1],
+                cache_hits=sum(1 for record in group if record.from_cache),
+                cache_misses=0
+            ))
+
+        return sorted(result, key=lambda entry: entry.total_latency, reverse=True)
+
+
+class _Context:
+    def __init__(self, metrics, context):
+        self._metrics = metrics
+        self._context = context
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = self._metrics.context
+        self._metrics.context = self._context
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._metrics.context = self._previous
+        return False
+
+
+HTTP_METRICS = HttpMetrics()
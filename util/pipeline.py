@@ -0,0 +1,122 @@
+import queue
+import threading
+from types import SimpleNamespace
+
+_STOP = object()
+_FED = object()
+_FEEDER_DONE = object()
+
+
+class PipelineStage:
+    def __init__(self, name, function, workers=1, capacity=None, on_main_thread=False):
+        self.name = name
+        self.function = function
+        self.workers = workers
+        self.capacity = capacity if capacity is not None else 2 * workers
+        self.on_main_thread = on_main_thread
+
+
+class Pipeline:
+    def __init__(self, stages):
+        self._stages = list(stages)
+        self.progress = {stage.name: SimpleNamespace(done=0, failed=0, skipped=0) for stage in self._stages}
+        self._stopped = threading.Event()
+
+    def run(self, items):
+        self._stopped = threading.Event()
+        events = queue.Queue()
+        inputs = [None if stage.on_main_thread else queue.Queue(maxsize=max(1, stage.capacity))
+                  for stage in self._stages]
+
+        threads = [threading.Thread(target=self._feed, args=(items, inputs, events), daemon=True)]
+        for index, stage in enumerate(self._stages):
+            if not stage.on_main_thread:
+                threads += [threading.Thread(target=self._work, args=(index, inputs[index], events), daemon=True)
+                            for _ in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+
+        in_flight, feeder_done = 0, False
+        try:
+            while not feeder_done or in_flight > 0:
+                event = events.get()
+                if event is _FED:
+                    in_flight += 1
+                    continue
+                if event is _FEEDER_DONE:
+                    feeder_done = True
+                    continue
+
+                index, item, result, error = event
+                while True:
+                    if index >= 0:
+                        yield self._finish(index, item, result, error)
+                        if error is not None or result is None or index + 1 == len(self._stages):
+                            in_flight -= 1
+                            break
+
+                    index, item = index + 1, result
+                    if not self._stages[index].on_main_thread:
+                        inputs[index].put(item)
+                        break
+
+                    result, error = _apply(self._stages[index].function, item)
+        finally:
+            self._stopped.set()
+            for index, stage in enumerate(self._stages):
+                if not stage.on_main_thread:
+                    _drain(inputs[index])
+                    for _ in range(stage.workers):
+                        inputs[index].put(_STOP)
+
+    def _finish(self, index, item, result, error):
+        stage = self._stages[index]
+        progress = self.progress[stage.name]
+        if error is not None:
+            progress.failed += 1
+        elif result is None:
+            progress.skipped += 1
+        else:
+            progress.done += 1
+
+        return SimpleNamespace(stage=stage.name, item=item, result=result, error=error, progress=progress)
+
+    def _feed(self, items, inputs, events):
+        try:
+            for item in items:
+                if self._stopped.is_set():
+                    break
+                events.put(_FED)
+                if self._stages[0].on_main_thread:
+                    events.put((-1, None, item, None))
+                else:
+                    inputs[0].put(item)
+        except Exception as e:
+            events.put(_FED)
+            events.put((0, None, None, e))
+        finally:
+            events.put(_FEEDER_DONE)
+
+    def _work(self, index, input_queue, events):
+        function = self._stages[index].function
+        while True:
+            item = input_queue.get()
+            if item is _STOP:
+                break
+            result, error = _apply(function, item)
+            events.put((index, item, result, error))
+
+
+def _drain(input_queue):
+    while True:
+        try:
+            input_queue.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _apply(function, item):
+    try:
+        return function(item), None
+    except Exception as e:
+        return None, e
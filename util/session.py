@@ -0,0 +1,145 @@
+import threading
+
+from util.timing import span
+
+
+def cookies_to_json(cookie_jar):
+    return [{"name": cookie.name, "value": cookie.value, "domain": cookie.domain, "path": cookie.path,
+             "secure": cookie.secure, "expires": cookie.expires} for cookie in cookie_jar]
+
+
+def restore_cookies(cookie_jar, cookies):
+    for cookie in cookies:
+        cookie_jar.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie["path"],
+                       secure=cookie["secure"], expires=cookie["expires"])
+
+
+class LazySession:
+    def __init__(self, session, title, storage=None, key=None):
+        self._session = session
+        self._title = title
+        self._storage = storage
+        self._key = key
+        self._thread = None
+        self._error = None
+        self._logged_in = False
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        self.resumed = False
+
+    @property
+    def title(self):
+        return self._title
+
+    @property
+    def state(self):
+        if self._thread is not None and self._thread.is_alive():
+            return 'logging in'
+        elif self._error is not None:
+            return 'login failed'
+        elif self._logged_in:
+            return 'online'
+        else:
+            return 'offline'
+
+    @property
+    def error(self):
+        return self._error
+
+    def login_in_background(self):
+        self._error = None
+        self._thread = threading.Thread(target=self._login, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self):
+        self._join()
+        if self._error is not None:
+            raise ConnectionRefusedError(f"Login to {self._title} failed: {self._error}")
+        return self._session
+
+    def login(self):
+        self._join()
+        self._error = None
+        self._session.login()
+        self._logged_in = True
+        self._login_generation += 1
+        self.resumed = False
+        self._save_state()
+
+    def logout(self, keep_session=False):
+        self._join()
+        if self._logged_in:
+            if keep_session:
+                self._save_state()
+            else:
+                self._session.logout()
+                self._remove_state()
+        self._logged_in = False
+
+    def get_online_state(self):
+        self._join()
+        return self._session.get_online_state()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attribute = getattr(self.wait(), name)
+        if not callable(attribute):
+            return attribute
+
+        def call_with_login(*args, **kwargs):
+            generation = self._login_generation
+            try:
+                return attribute(*args, **kwargs)
+            except ConnectionRefusedError:
+                # parallel downloads fail together when the session expires, only the first one logs in again
+                with self._login_lock:
+                    if self._login_generation == generation:
+                        if self._session.get_online_state() == 'online':
+                            raise
+                        self.login()
+                return attribute(*args, **kwargs)
+
+        return call_with_login
+
+    def _join(self):
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _login(self):
+        try:
+            with span(f"login.{self._title}"):
+                self.resumed = self._resume()
+                if not self.resumed:
+                    self._session.login()
+                    self._save_state()
+            self._logged_in = True
+        except Exception as e:
+            self._error = e
+
+    def _resume(self):
+        if self._storage is None:
+            return False
+
+        try:
+            state, _ = self._storage.load_session_state(self._key)
+            if state is not None:
+                self._session.restore_state(state)
+                if self._session.get_online_state() == 'online':
+                    return True
+        except Exception:
+            pass
+
+        self._remove_state()
+        return False
+
+    def _save_state(self):
+        if self._storage is not None:
+            self._storage.save_session_state(self._key, self._session.export_state())
+
+    def _remove_state(self):
+        if self._storage is not None:
+            self._storage.remove_session_state(self._key)
@@ -0,0 +1,74 @@
+import errno
+import os
+import shutil
+
+FICLONE = 0x40049409
+STAGING_METHODS = ("reflink", "copy")
+STAGING_MODES = {
+    "auto": ("reflink", "copy"),
+    "reflink": ("reflink", "copy"),
+    "copy": ("copy",)
+}
+UNSUPPORTED_ERRORS = (errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP, errno.ENOSYS)
+
+
+class TreeStager:
+    def __init__(self, mode='auto'):
+        if mode not in STAGING_MODES:
+            raise ValueError(f"Unknown staging mode '{mode}' (staging.py: TreeStager)")
+
+        self._methods = list(STAGING_MODES[mode])
+        self.files = {method: 0 for method in STAGING_METHODS}
+        self.bytes_total = 0
+        self.bytes_saved = 0
+
+    def stage(self, source, target):
+        shutil.copytree(source, target, copy_function=self.stage_file)
+
+    def stage_file(self, source, target):
+        size = os.path.getsize(source)
+        for method in list(self._methods):
+            try:
+                if method == "reflink":
+                    _reflink(source, target)
+                else:
+                    shutil.copy2(source, target)
+                break
+            except OSError as e:
+                if method == "copy" or e.errno not in UNSUPPORTED_ERRORS:
+                    raise
+                self._methods.remove(method)
+
+        self.files[method] += 1
+        self.bytes_total += size
+        if method != "copy":
+            self.bytes_saved += size
+
+        return target
+
+    @property
+    def number_of_files(self):
+        return sum(self.files.values())
+
+    @property
+    def summary(self):
+        methods = ', '.join(f'{count} {method}' for method, count in self.files.items() if count > 0)
+        return f"{self.number_of_files} files ({methods}), " \
+               f"{self.bytes_total / 2 ** 20:.1f} MB staged, {self.bytes_saved / 2 ** 20:.1f} MB saved"
+
+
+def _reflink(source, target):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOSYS, "Reflinks are not supported on this platform")
+
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+    shutil.copystat(source, target)
+
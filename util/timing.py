@@ -0,0 +1,142 @@
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from json import dump as j_dump
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+DEFAULT_TRACING_CONFIG = {
+    "enabled": True,
+    "trace_file": None,
+    "max_events": 100000
+}
+
+
+def tracing_settings(config=None):
+    values = dict(DEFAULT_TRACING_CONFIG)
+    if config is not None:
+        values.update(vars(config))
+    return SimpleNamespace(**values)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, args):
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        args = self._args
+        if exc_type is not None:
+            args = dict(args or dict(), error=exc_type.__name__)
+        self._tracer.record(self._name, self._start, time.perf_counter() - self._start, args)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=True, max_events=DEFAULT_TRACING_CONFIG["max_events"]):
+        self.enabled = enabled
+        self.max_events = max_events
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._durations = defaultdict(list)
+        self._events = list()
+
+    def configure(self, settings):
+        self.enabled = settings.enabled
+        self.max_events = settings.max_events
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args or None)
+
+    def record(self, name, start, duration, args=None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._durations[name].append(duration)
+            if len(self._events) < self.max_events:
+                self._events.append((name, start, duration, threading.get_ident(), args))
+
+    def summary(self):
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self._durations.items()}
+
+        return sorted((SimpleNamespace(name=name, count=len(values), total=sum(values),
+                                       p50=_percentile(values, 0.50), p95=_percentile(values, 0.95))
+                       for name, values in durations.items()), key=lambda entry: entry.total, reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._events.clear()
+
+    def export_chrome_trace(self, path):
+        with self._lock:
+            events = list(self._events)
+
+        pid = os.getpid()
+        trace_events = list()
+        for name, start, duration, thread_id, args in events:
+            event = {
+                "name": name,
+                "cat": name.split('.', 1)[0],
+                "ph": "X",
+                "ts": round((start - self._origin) * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": thread_id
+            }
+            if args is not None:
+                event["args"] = args
+            trace_events.append(event)
+
+        with open(path, 'w', encoding='utf-8') as fp:
+            j_dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, fp)
+
+        return len(trace_events)
+
+
+def _percentile(sorted_values, fraction):
+    if len(sorted_values) == 0:
+        return 0.0
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+TRACER = Tracer()
+
+
+def span(name, **args):
+    return TRACER.span(name, **args)
+
+
+def trace_response(response, *args, **kwargs):
+    if not TRACER.enabled:
+        return
+
+    duration = response.elapsed.total_seconds()
+    request = response.request
+    url = urlsplit(request.url)
+    TRACER.record(f"http.{request.method} {url.netloc}", time.perf_counter() - duration, duration,
+                  {"path": url.path, "status": response.status_code})